@@ -0,0 +1,39 @@
+"""Add note_counters table
+
+Revision ID: 4f1d2c8a9b10
+Revises: 053baf0f469c
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f1d2c8a9b10'
+down_revision: Union[str, Sequence[str], None] = '053baf0f469c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rows are built lazily by services/counters.py on the first read
+    op.create_table(
+        'note_counters',
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('active', sa.Integer(), nullable=False),
+        sa.Column('pinned', sa.Integer(), nullable=False),
+        sa.Column('favorite', sa.Integer(), nullable=False),
+        sa.Column('archived', sa.Integer(), nullable=False),
+        sa.Column('shared_with_me', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('owner_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('note_counters')
@@ -0,0 +1,39 @@
+"""Add note versions and change sequences for ETags
+
+Revision ID: a8d2e6f4c913
+Revises: f7a1c3e9b240
+Create Date: 2026-10-18 15:10:08.664372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8d2e6f4c913'
+down_revision: Union[str, Sequence[str], None] = 'f7a1c3e9b240'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('notes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    # Scopes without a row read as sequence 0
+    op.create_table(
+        'change_sequences',
+        sa.Column('scope', sa.String(), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('scope')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('change_sequences')
+    with op.batch_alter_table('notes', schema=None) as batch_op:
+        batch_op.drop_column('version')
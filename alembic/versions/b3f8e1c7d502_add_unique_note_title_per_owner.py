@@ -0,0 +1,57 @@
+"""Make note titles unique per owner
+
+Revision ID: b3f8e1c7d502
+Revises: a8d2e6f4c913
+Create Date: 2026-10-18 16:02:41.118094
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f8e1c7d502'
+down_revision: Union[str, Sequence[str], None] = 'a8d2e6f4c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Titles were only checked on create, so edits may have left duplicates:
+    # the oldest note keeps its title, the others get their id appended
+    # (then a counter, should that title be taken too)
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text(
+        "SELECT id, owner_id, title FROM notes WHERE id NOT IN "
+        "(SELECT MIN(id) FROM notes GROUP BY owner_id, title) ORDER BY id"
+    )).all()
+    # Only the older search index kept its own copy of the titles; the
+    # current one (services/search.py) is updated by triggers on notes
+    has_fts = bind.execute(sa.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts' AND sql NOT LIKE '%content=%'"
+    )).first() is not None
+    taken = sa.text("SELECT 1 FROM notes WHERE owner_id IS :owner_id AND title = :title")
+    for note_id, owner_id, title in duplicates:
+        renamed, attempt = f"{title} ({note_id})", 1
+        while bind.execute(taken, {"owner_id": owner_id, "title": renamed}).first() is not None:
+            attempt += 1
+            renamed = f"{title} ({note_id}-{attempt})"
+        # A new version so cached ETags of the note stop matching
+        bind.execute(
+            sa.text("UPDATE notes SET title = :title, version = version + 1 WHERE id = :id"),
+            {"title": renamed, "id": note_id}
+        )
+        if has_fts:
+            bind.execute(sa.text("UPDATE notes_fts SET title = :title WHERE rowid = :id"), {"title": renamed, "id": note_id})
+
+    with op.batch_alter_table('notes', schema=None) as batch_op:
+        batch_op.create_index('uq_notes_owner_title', ['owner_id', 'title'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('notes', schema=None) as batch_op:
+        batch_op.drop_index('uq_notes_owner_title')
@@ -0,0 +1,69 @@
+"""Add indexes and constraints for the note list queries
+
+Revision ID: c1e7f3a2b5d8
+Revises: 9a3e5b7c1d24
+Create Date: 2026-10-18 11:48:05.271630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c1e7f3a2b5d8'
+down_revision: Union[str, Sequence[str], None] = '9a3e5b7c1d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rows from before the flags had defaults: NULL never matches the
+    # equality filters the indexes are built for
+    for column in ('archived', 'pinned', 'favorite', 'important'):
+        op.execute(f"UPDATE notes SET {column} = 0 WHERE {column} IS NULL")
+
+    # Drop duplicates the new constraints would reject, keeping the oldest row
+    op.execute(
+        "DELETE FROM shared_notes WHERE id NOT IN "
+        "(SELECT MIN(id) FROM shared_notes GROUP BY note_id, user_id)"
+    )
+    op.execute(
+        "DELETE FROM note_tags WHERE rowid NOT IN "
+        "(SELECT MIN(rowid) FROM note_tags GROUP BY note_id, tag_id)"
+    )
+
+    with op.batch_alter_table('notes', schema=None) as batch_op:
+        batch_op.create_index('ix_notes_owner_archived_pinned_id', ['owner_id', 'archived', 'pinned', 'id'], unique=False)
+        batch_op.create_index('ix_notes_owner_archived_favorite_id', ['owner_id', 'archived', 'favorite', 'id'], unique=False)
+        batch_op.create_index('ix_notes_archived_pinned_id', ['archived', 'pinned', 'id'], unique=False)
+
+    with op.batch_alter_table('shared_notes', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_shared_notes_note_user', ['note_id', 'user_id'])
+        batch_op.create_index('ix_shared_notes_user_note', ['user_id', 'note_id'], unique=False)
+
+    with op.batch_alter_table('note_tags', schema=None, recreate='always') as batch_op:
+        batch_op.alter_column('note_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('tag_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_primary_key('pk_note_tags', ['note_id', 'tag_id'])
+        batch_op.create_index('ix_note_tags_tag_note', ['tag_id', 'note_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('note_tags', schema=None, recreate='always') as batch_op:
+        batch_op.drop_index('ix_note_tags_tag_note')
+        batch_op.drop_constraint('pk_note_tags', type_='primary')
+        batch_op.alter_column('tag_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.alter_column('note_id', existing_type=sa.Integer(), nullable=True)
+
+    with op.batch_alter_table('shared_notes', schema=None) as batch_op:
+        batch_op.drop_index('ix_shared_notes_user_note')
+        batch_op.drop_constraint('uq_shared_notes_note_user', type_='unique')
+
+    with op.batch_alter_table('notes', schema=None) as batch_op:
+        batch_op.drop_index('ix_notes_archived_pinned_id')
+        batch_op.drop_index('ix_notes_owner_archived_favorite_id')
+        batch_op.drop_index('ix_notes_owner_archived_pinned_id')
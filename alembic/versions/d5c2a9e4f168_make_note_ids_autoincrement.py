@@ -0,0 +1,35 @@
+"""Never reuse note ids
+
+Revision ID: d5c2a9e4f168
+Revises: b3f8e1c7d502
+Create Date: 2026-10-18 18:41:07.527310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5c2a9e4f168'
+down_revision: Union[str, Sequence[str], None] = 'b3f8e1c7d502'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite hands the id of a deleted last row to the next insert unless
+    # the table is AUTOINCREMENT, which needs a rebuild. The copy seeds
+    # sqlite_sequence with the current highest id.
+    with op.batch_alter_table(
+        'notes', schema=None, recreate='always', table_kwargs={'sqlite_autoincrement': True}
+    ) as batch_op:
+        pass
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('notes', schema=None, recreate='always') as batch_op:
+        pass
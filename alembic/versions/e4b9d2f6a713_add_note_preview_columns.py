@@ -0,0 +1,41 @@
+"""Add preview and content_length to notes
+
+Revision ID: e4b9d2f6a713
+Revises: c1e7f3a2b5d8
+Create Date: 2026-10-18 13:05:42.918204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b9d2f6a713'
+down_revision: Union[str, Sequence[str], None] = 'c1e7f3a2b5d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match models/note.PREVIEW_LENGTH
+PREVIEW_LENGTH = 200
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('notes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('preview', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('content_length', sa.Integer(), nullable=True))
+
+    # substr()/length() count characters, like the Python slice and len()
+    op.execute(
+        f"UPDATE notes SET preview = substr(content, 1, {PREVIEW_LENGTH}), "
+        "content_length = length(content)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('notes', schema=None) as batch_op:
+        batch_op.drop_column('content_length')
+        batch_op.drop_column('preview')
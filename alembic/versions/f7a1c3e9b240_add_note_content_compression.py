@@ -0,0 +1,46 @@
+"""Add compressed storage columns for note bodies
+
+Revision ID: f7a1c3e9b240
+Revises: e4b9d2f6a713
+Create Date: 2026-10-18 14:22:17.530861
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a1c3e9b240'
+down_revision: Union[str, Sequence[str], None] = 'e4b9d2f6a713'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows keep their inline body and no codec marker; compress
+    # them afterwards with `python -m services.storage recompress`
+    with op.batch_alter_table('notes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_blob', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('content_codec', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Bring compressed bodies back inline before the columns go away
+    from models import compression
+
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(
+        "SELECT id, content, content_blob, content_codec FROM notes WHERE content_codec IS NOT NULL"
+    )).all()
+    for row in rows:
+        conn.execute(
+            sa.text("UPDATE notes SET content = :content WHERE id = :id"),
+            {"id": row.id, "content": compression.decode(row.content, row.content_blob, row.content_codec)}
+        )
+    with op.batch_alter_table('notes', schema=None) as batch_op:
+        batch_op.drop_column('content_codec')
+        batch_op.drop_column('content_blob')
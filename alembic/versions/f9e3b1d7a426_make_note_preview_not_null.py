@@ -0,0 +1,57 @@
+"""Backfill and require note preview and content_length
+
+Revision ID: f9e3b1d7a426
+Revises: d5c2a9e4f168
+Create Date: 2026-10-18 19:12:33.604281
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from models import compression
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f9e3b1d7a426'
+down_revision: Union[str, Sequence[str], None] = 'd5c2a9e4f168'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match models/note.PREVIEW_LENGTH
+PREVIEW_LENGTH = 200
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Notes written through Notes(content=...) before the setter kept these
+    # columns in step. Inline bodies are filled in SQL, compressed ones
+    # have to be decoded here.
+    op.execute(
+        f"UPDATE notes SET preview = substr(content, 1, {PREVIEW_LENGTH}), "
+        "content_length = length(content) "
+        "WHERE (preview IS NULL OR content_length IS NULL) AND content_codec IS NULL"
+    )
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT id, content, content_blob, content_codec FROM notes "
+        "WHERE (preview IS NULL OR content_length IS NULL) AND content_codec IS NOT NULL"
+    )).all()
+    for note_id, inline, blob, codec in rows:
+        body = compression.decode(inline, blob, codec)
+        bind.execute(
+            sa.text("UPDATE notes SET preview = :preview, content_length = :length WHERE id = :id"),
+            {"preview": body[:PREVIEW_LENGTH], "length": len(body), "id": note_id}
+        )
+
+    with op.batch_alter_table('notes', schema=None, table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        batch_op.alter_column('preview', existing_type=sa.String(), nullable=False)
+        batch_op.alter_column('content_length', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('notes', schema=None, table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        batch_op.alter_column('content_length', existing_type=sa.Integer(), nullable=True)
+        batch_op.alter_column('preview', existing_type=sa.String(), nullable=True)
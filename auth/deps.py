@@ -2,9 +2,10 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from auth.jwt_handler import SECRET_KEY, ALGORITHM
-from database import get_db
-from auth.users import get_user_by_username
-from sqlalchemy.orm import Session
+from auth.cache import AuthenticatedUser, principal_cache, token_cache
+from database import get_async_db
+from auth.users import get_user_by_username_async
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
@@ -16,18 +17,33 @@ def credentials_exception():
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+def decode_subject(token: str) -> str:
+    # Verified `sub` of a token; the result is cached until the token expires
+    username = token_cache.get(token)
+    if username is not None:
+        return username
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception()
+    username = payload.get("sub")
+    if username is None:
+        raise credentials_exception()
+    token_cache.set(token, username, expires_at=payload.get("exp"))
+    return username
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if username is None:
-            raise credentials_exception()
-        user = get_user_by_username(username = username, db=db)
-        if user is None:
-            raise credentials_exception()
+    # Steady state: both lookups are cache hits and no query is issued
+    username = decode_subject(token)
+    user = principal_cache.get(username)
+    if user is not None:
         return user
-    except JWTError:
-        raise credentials_exception()
\ No newline at end of file
+    db_user = await get_user_by_username_async(username=username, db=db)
+    if db_user is None:
+        raise credentials_exception()
+    user = AuthenticatedUser(id=db_user.id, username=db_user.username)
+    principal_cache.set(username, user)
+    return user
@@ -0,0 +1,122 @@
+import hashlib
+import hmac
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth.jwt_handler import SECRET_KEY
+from models.refresh_token import RefreshToken
+from models.user import User
+
+load_dotenv()
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+# Rotated and revoked rows are kept this long so a replayed token still
+# revokes its family; after that they are purged like expired ones
+REFRESH_TOKEN_REUSE_HOURS = int(os.getenv("REFRESH_TOKEN_REUSE_HOURS", 24))
+
+# Refresh tokens are random, so a keyed SHA-256 is enough to make a leaked
+# table useless; renewing costs one indexed lookup instead of a bcrypt verify.
+
+def hash_refresh_token(token: str) -> str:
+    return hmac.new(SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands datetimes back without tzinfo
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def invalid_refresh_token():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def issue_refresh_token(db: AsyncSession, user_id: int, family_id: Optional[str] = None) -> str:
+    # Adds the token row to the session; the caller commits
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or secrets.token_hex(16),
+        expires_at=_now() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+async def _revoke_family(db: AsyncSession, family_id: str) -> None:
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=_now())
+    )
+
+
+async def purge_refresh_tokens(db: AsyncSession, user_id: int) -> None:
+    # Drop the user's expired rows and those revoked before the reuse window
+    now = _now()
+    await db.execute(
+        delete(RefreshToken).where(
+            RefreshToken.user_id == user_id,
+            or_(
+                RefreshToken.expires_at <= now,
+                RefreshToken.revoked_at <= now - timedelta(hours=REFRESH_TOKEN_REUSE_HOURS)
+            )
+        ).execution_options(synchronize_session=False)
+    )
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Tuple[str, str]:
+    # Swap a valid refresh token for a new one; returns (username, new token).
+    # Presenting an already rotated token means it leaked: the whole family
+    # is revoked so neither copy can be used again.
+    row = (await db.execute(
+        select(RefreshToken, User.username)
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == hash_refresh_token(token))
+    )).first()
+    if row is None:
+        raise invalid_refresh_token()
+    stored, username = row
+    if stored.revoked_at is not None:
+        await _revoke_family(db, stored.family_id)
+        await db.commit()
+        raise invalid_refresh_token()
+    if _as_utc(stored.expires_at) <= _now():
+        raise invalid_refresh_token()
+
+    # Conditional UPDATE so two concurrent renewals cannot both succeed
+    claimed = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == stored.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=_now())
+    )
+    if claimed.rowcount != 1:
+        await db.rollback()
+        raise invalid_refresh_token()
+    new_token = issue_refresh_token(db, stored.user_id, stored.family_id)
+    # Each renewal leaves a row behind; clean up in the same transaction
+    await purge_refresh_tokens(db, stored.user_id)
+    await db.commit()
+    return username, new_token
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str) -> None:
+    # Logout: revoke the token and everything rotated from the same login
+    stored = await db.scalar(
+        select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(token))
+    )
+    if stored is not None:
+        await _revoke_family(db, stored.family_id)
+        await db.commit()
@@ -1,5 +1,7 @@
 from typing import Optional
 from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models.user import User
 
@@ -15,6 +17,10 @@ def verify_password(plain_password, hashed_password):
 def get_user_by_username(username: str, db: Session)-> Optional[User]:
     return db.query(User).filter(User.username == username).first()
 
+async def get_user_by_username_async(username: str, db: AsyncSession) -> Optional[User]:
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
 # bd user
 #fake_users_db = {
 #    "bruno": {
@@ -0,0 +1,3 @@
+# Endpoint benchmarks: deterministic datasets (seed.py) and the drivers
+# that time the routes and services against them (run.py).
+#   python -m benchmarks.run --notes 100k --output before.json
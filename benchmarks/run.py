@@ -0,0 +1,264 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Times the endpoints in-process (httpx.ASGITransport, no network) and the
+# services directly, against a dataset from benchmarks/seed.py:
+#   python -m benchmarks.run --notes 100k --requests 200 --output after.json
+# Each case reports ops/sec, p50/p95/p99 latency in ms and the SQL
+# statements per request; the JSON has sorted keys so two runs diff cleanly.
+# The database is chosen from the command line before the app is imported,
+# so the app modules are only imported inside the functions below.
+
+DEFAULT_DATABASE = "benchmark.db"
+DEFAULT_REQUESTS = 100
+DEFAULT_WARMUP = 5
+PAGE_SIZE = 20
+SEARCH_TERMS_SKIP = 20
+
+
+def percentile(latencies: List[float], fraction: float) -> float:
+    # Nearest rank over sorted latencies
+    index = max(0, min(len(latencies) - 1, round(fraction * len(latencies) + 0.5) - 1))
+    return latencies[index]
+
+
+def summarize(latencies: List[float], statements: int) -> dict:
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "requests": len(latencies),
+        "ops_per_sec": round(len(latencies) / total, 1) if total else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "statements_per_request": round(statements / len(latencies), 2),
+    }
+
+
+@contextmanager
+def count_statements():
+    # Every statement sent on either engine (sync services, async routes)
+    from sqlalchemy import event
+    from database import async_engine, engine
+
+    counter = {"statements": 0}
+    def record(conn, cursor, statement, parameters, context, executemany):
+        counter["statements"] += 1
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", record)
+    try:
+        yield counter
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", record)
+
+
+async def time_async(call: Callable[[int], object], requests: int, warmup: int) -> dict:
+    # `call(i)` returns an awaitable request; any error status fails the run
+    for i in range(warmup):
+        await call(-1 - i)
+    latencies = []
+    with count_statements() as counter:
+        for i in range(requests):
+            start = time.perf_counter()
+            await call(i)
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies, counter["statements"])
+
+
+def time_sync(call: Callable[[int], object], requests: int, warmup: int) -> dict:
+    for i in range(warmup):
+        call(-1 - i)
+    latencies = []
+    with count_statements() as counter:
+        for i in range(requests):
+            start = time.perf_counter()
+            call(i)
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies, counter["statements"])
+
+
+def _checked(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url}: {response.status_code} {response.text[:200]}")
+    return response
+
+
+async def run_benchmarks(
+    dataset: dict,
+    requests: int = DEFAULT_REQUESTS,
+    warmup: int = DEFAULT_WARMUP,
+    cases: Optional[List[str]] = None,
+    response_cache: bool = False
+) -> Dict[str, dict]:
+    # Acts as the heaviest owner of the dataset; shares go to the others.
+    # With response_cache=False every list request runs its queries.
+    from httpx import ASGITransport, AsyncClient
+    from sqlalchemy import select
+    from auth.jwt_handler import create_access_token
+    from database import SessionLocal
+    from main import app
+    from models.note import Notes
+    from services import note_service, response_cache as cache
+    from benchmarks.seed import WORDS
+    search_terms = WORDS[SEARCH_TERMS_SKIP::len(WORDS) // 50]
+
+    username, user_id = dataset["users"][0], dataset["user_ids"][0]
+    recipients = dataset["users"][1:] or [username]
+    with SessionLocal() as db:
+        note_ids = list(db.scalars(
+            select(Notes.id).where(Notes.owner_id == user_id).order_by(Notes.id).limit(1000)
+        ))
+    if not note_ids:
+        raise RuntimeError(f"{username} owns no notes")
+    run_id = time.time_ns()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+    previous = cache.backend
+    if not response_cache:
+        cache.use(cache.NullResponseCache())
+    results = {}
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", headers=headers) as client:
+            http_cases = {
+                "http.list_notes": lambda i: _get(client, f"/notes/?limit={PAGE_SIZE}"),
+                "http.list_notes_deep_offset": lambda i: _get(client, f"/notes/?limit={PAGE_SIZE}&offset={len(note_ids) // 2}"),
+                "http.list_mine": lambda i: _get(client, f"/notes/mine?limit={PAGE_SIZE}"),
+                "http.list_mine_summary": lambda i: _get(client, f"/notes/mine?limit={PAGE_SIZE}&view=summary"),
+                "http.list_shared": lambda i: _get(client, f"/notes/shared?limit={PAGE_SIZE}"),
+                "http.list_visible": lambda i: _get(client, f"/notes/visible?limit={PAGE_SIZE}"),
+                "http.tag_facets": lambda i: _get(client, "/notes/tags"),
+                "http.get_note": lambda i: _get(client, f"/notes/{note_ids[i % len(note_ids)]}"),
+                # From frequent to rare terms, skipping the most common words
+                "http.search": lambda i: _get(client, f"/notes/?q={search_terms[i % len(search_terms)]}&limit={PAGE_SIZE}"),
+                "http.create_note": lambda i: _post(client, "/notes/", {
+                    "title": f"bench {run_id} {i}", "content": " ".join(WORDS[:40]), "tags": [WORDS[i % len(WORDS)]]
+                }),
+                "http.share_note": lambda i: _post(client, f"/notes/{note_ids[i % len(note_ids)]}/share", {
+                    "recipient_username": recipients[i % len(recipients)], "can_edit": i % 2 == 0
+                }),
+            }
+            for name, call in http_cases.items():
+                if cases is None or name in cases:
+                    results[name] = await time_async(call, requests, warmup)
+
+            # Whole-export throughput: a few runs, reported in notes per second
+            if cases is None or "http.export" in cases:
+                exported = {}
+                async def export(i):
+                    body = (await _get(client, "/notes/export")).content
+                    exported["notes"], exported["bytes"] = body.count(b"\n"), len(body)
+                runs = max(1, min(requests, 5))
+                result = await time_async(export, runs, 1)
+                result["notes_per_export"] = exported["notes"]
+                result["bytes_per_export"] = exported["bytes"]
+                result["notes_per_sec"] = round(exported["notes"] * result["ops_per_sec"], 1) if result["ops_per_sec"] else None
+                results["http.export"] = result
+
+        service_cases = {
+            "service.list_owned_notes": lambda db, i: note_service.list_owned_notes(db, user_id, limit=PAGE_SIZE),
+            "service.list_notes_paginated": lambda db, i: note_service.list_notes_paginated(db, limit=PAGE_SIZE),
+            "service.tag_facets": lambda db, i: note_service.tag_facets(db, user_id),
+        }
+        for name, call in service_cases.items():
+            if cases is None or name in cases:
+                with SessionLocal() as db:
+                    results[name] = time_sync(lambda i: call(db, i), requests, warmup)
+    finally:
+        cache.use(previous)
+    return results
+
+
+async def _get(client, path: str):
+    return _checked(await client.get(path))
+
+
+async def _post(client, path: str, payload: dict):
+    return _checked(await client.post(path, json=payload))
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Endpoint benchmarks")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="SQLite file for the dataset")
+    parser.add_argument("--notes", default="10k", help="Dataset size: 1k, 10k, 100k, 1m or a number")
+    parser.add_argument("--users", type=int, default=0, help="Defaults to one user per 100 notes")
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--share-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reuse", action="store_true", help="Keep an existing database instead of reseeding it")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--case", action="append", dest="cases", help="Only run this case (repeatable)")
+    parser.add_argument("--response-cache", action="store_true", help="Keep the list response cache on")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    path = os.path.abspath(args.database)
+    if not args.reuse:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+
+    import main  # noqa: F401  creates the schema
+    from database import SessionLocal
+    from models.user import User
+    from benchmarks import seed
+
+    notes = seed.parse_scale(args.notes)
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        usernames = seed.usernames(args.users or seed.default_users(notes), args.seed)
+        ids = dict(db.query(User.username, User.id).filter(User.username.in_(usernames)).all())
+        if args.reuse and len(ids) == len(usernames):
+            dataset = {"users": usernames, "user_ids": [ids[name] for name in usernames]}
+        else:
+            dataset = seed.seed_dataset(db, notes, args.users, args.tags, args.share_ratio, args.seed)
+    seconds = round(time.perf_counter() - started, 2)
+
+    results = asyncio.run(run_benchmarks(dataset, args.requests, args.warmup, args.cases, args.response_cache))
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "notes": notes,
+            "users": len(dataset["users"]),
+            "tags": args.tags,
+            "share_ratio": args.share_ratio,
+            "seed": args.seed,
+            "seed_seconds": seconds,
+            "requests": args.requests,
+            "response_cache": args.response_cache,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
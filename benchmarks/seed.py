@@ -0,0 +1,165 @@
+import random
+from typing import Iterator, List, Tuple
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from auth.users import get_password_hash
+from database import engine
+from models.note import Notes, SharedNote
+from models.note_tags import note_tags
+from models.tag import Tag
+from models.user import User
+from services.note_service import content_fields
+from services.search import init_search_index
+
+# Deterministic datasets for the benchmarks: the same arguments always give
+# the same rows. Written with bulk INSERTs, CHUNK_SIZE notes per transaction,
+# bypassing the services (counters are built on first read, the search
+# index is filled by its triggers as the rows go in).
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+CHUNK_SIZE = 10_000
+PASSWORD = "benchmark"
+USER_PREFIX = "bench-user-"
+TAG_PREFIX = "bench-tag-"
+
+# Common words first, then made-up ones; word frequencies follow Zipf's
+# law over this order, so later words are rarer and make selective searches
+WORDS = (
+    "note meeting project idea todo plan review draft report budget release "
+    "sprint design schema query index cache latency server client backup deploy "
+    "invoice travel recipe garden book movie music health workout family school "
+    "bug feature customer market sales quarter goal memo alpha beta gamma delta"
+).split() + [
+    first + second + third
+    for first in ("ka", "lo", "mi", "re", "tu", "sa", "no", "pe", "di", "vo")
+    for second in ("ra", "li", "mo", "ne", "ku", "ta", "si", "po", "de", "va")
+    for third in ("n", "l", "s", "t", "r", "x", "m", "k")
+]
+# Share of notes whose body is above the compression threshold
+LONG_BODY_RATIO = 0.02
+
+
+def parse_scale(value: str) -> int:
+    return SCALES[value.lower()] if value.lower() in SCALES else int(value)
+
+
+def default_users(notes: int) -> int:
+    return max(2, notes // 100)
+
+
+def usernames(users: int, seed: int) -> List[str]:
+    return [f"{USER_PREFIX}{seed}-{i}" for i in range(users)]
+
+
+def _zipf_weights(count: int) -> List[float]:
+    # A few owners and tags get most of the notes, like real usage
+    return [1 / (rank + 1) for rank in range(count)]
+
+
+def generate(
+    notes: int, users: int, tags: int, share_ratio: float = 0.05, seed: int = 42
+) -> Iterator[Tuple[dict, List[int], List[Tuple[int, bool]]]]:
+    # (note row, tag indexes, [(recipient index, can_edit)]) per note; owner
+    # and recipients are user indexes, the heaviest owner is index 0
+    rng = random.Random(seed)
+    owner_weights = _zipf_weights(users)
+    tag_weights = _zipf_weights(tags)
+    word_weights = _zipf_weights(len(WORDS))
+    for i in range(notes):
+        owner = rng.choices(range(users), owner_weights)[0]
+        words = rng.choices(WORDS, word_weights, k=rng.randint(20, 120))
+        if rng.random() < LONG_BODY_RATIO:
+            words *= 60
+        note = {
+            "title": f"Note {i} {' '.join(words[:3])}",
+            "content": " ".join(words),
+            "owner_id": owner,
+            "important": rng.random() < 0.1,
+            "archived": rng.random() < 0.1,
+            "pinned": rng.random() < 0.05,
+            "favorite": rng.random() < 0.15,
+        }
+        tag_indexes = sorted(set(rng.choices(range(tags), tag_weights, k=rng.randint(0, 4)))) if tags else []
+        shares = []
+        if users > 1 and rng.random() < share_ratio:
+            others = [user for user in range(users) if user != owner]
+            shares = [(user, rng.random() < 0.3) for user in rng.sample(others, min(len(others), rng.randint(1, 3)))]
+        yield note, tag_indexes, shares
+
+
+def seed_dataset(
+    db: Session,
+    notes: int = 10_000,
+    users: int = 0,
+    tags: int = 200,
+    share_ratio: float = 0.05,
+    seed: int = 42
+) -> dict:
+    # Insert the dataset next to whatever the database holds and return
+    # what the drivers need: the users (heaviest owner first) and counts
+    users = users or default_users(notes)
+    hashed = get_password_hash(PASSWORD)
+    names = usernames(users, seed)
+    db.execute(
+        sqlite_insert(User).values([{"username": name, "hashed_password": hashed} for name in names])
+        .on_conflict_do_nothing(index_elements=["username"])
+    )
+    user_ids = dict(db.execute(select(User.username, User.id).where(User.username.in_(names))).all())
+    user_ids = [user_ids[name] for name in names]
+
+    tag_names = [f"{TAG_PREFIX}{i:04d}" for i in range(tags)]
+    if tag_names:
+        db.execute(
+            sqlite_insert(Tag).values([{"name": name} for name in tag_names])
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+    tag_ids = dict(db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(tag_names))).all())
+    tag_ids = [tag_ids[name] for name in tag_names]
+    db.commit()
+
+    # Index first, its triggers then keep up with the inserts
+    init_search_index(engine)
+    # Explicit ids, so tag and share rows need no RETURNING round trip
+    next_id = (db.scalar(select(func.max(Notes.id))) or 0) + 1
+    counts = {"notes": 0, "note_tags": 0, "shares": 0}
+    chunk = []
+    for row in generate(notes, users, tags, share_ratio, seed):
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            next_id = _insert_chunk(db, chunk, next_id, user_ids, tag_ids, counts)
+            chunk = []
+    if chunk:
+        _insert_chunk(db, chunk, next_id, user_ids, tag_ids, counts)
+
+    return {
+        **counts,
+        "users": names,
+        "user_ids": user_ids,
+        "tags": tags,
+        "share_ratio": share_ratio,
+        "seed": seed,
+    }
+
+
+def _insert_chunk(db: Session, chunk, next_id: int, user_ids: List[int], tag_ids: List[int], counts: dict) -> int:
+    note_rows, tag_rows, share_rows = [], [], []
+    for offset, (note, tag_indexes, shares) in enumerate(chunk):
+        note_id = next_id + offset
+        content = note.pop("content")
+        note_rows.append({
+            **note, **content_fields(content), "id": note_id, "owner_id": user_ids[note["owner_id"]]
+        })
+        tag_rows += [{"note_id": note_id, "tag_id": tag_ids[tag]} for tag in tag_indexes]
+        share_rows += [
+            {"note_id": note_id, "user_id": user_ids[user], "can_edit": can_edit} for user, can_edit in shares
+        ]
+    db.execute(insert(Notes), note_rows)
+    if tag_rows:
+        db.execute(insert(note_tags), tag_rows)
+    if share_rows:
+        db.execute(insert(SharedNote), share_rows)
+    db.commit()
+    counts["notes"] += len(note_rows)
+    counts["note_tags"] += len(tag_rows)
+    counts["shares"] += len(share_rows)
+    return next_id + len(chunk)
@@ -1,16 +1,108 @@
-from sqlalchemy import create_engine
+import os
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 
-# SQLite file
-DATABASE_URL = "sqlite:///./notas.db"
+load_dotenv()
+
+# SQLite file by default; override per environment
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./notas.db")
+# Same database through the aiosqlite driver, used by the async routes
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
+
+# Connection pool (ignored for in-memory SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", -1))
+
+# PRAGMAs applied to every new SQLite connection, by profile:
+# - default: WAL so readers never wait for the writer, NORMAL sync (safe in
+#   WAL, no fsync per commit), a busy timeout instead of "database is locked",
+#   64 MiB page cache, 256 MiB mmap and in-memory temp tables
+# - durable: the same with a full fsync on every commit
+# - test: throwaway databases, durability not needed
+# - none: SQLite defaults
+SQLITE_PROFILES = {
+    "default": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "test": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+    "none": {},
+}
+DB_PROFILE = os.getenv("DB_PROFILE", "default")
+
+
+def apply_sqlite_pragmas(dbapi_connection, profile: str = DB_PROFILE) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PROFILES[profile].items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def register_sqlite_functions(dbapi_connection) -> None:
+    # note_text(content, content_blob, content_codec): the plain body of a
+    # note row, used by the search index view and triggers (services/search.py)
+    from models.compression import decode  # Delayed import, models import this module
+    dbapi_connection.create_function("note_text", 3, decode, deterministic=True)
+
+
+def _engine_options(url: str) -> dict:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
+def _configure(sync_engine) -> None:
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", lambda conn, record: apply_sqlite_pragmas(conn))
+        event.listen(sync_engine, "connect", lambda conn, record: register_sqlite_functions(conn))
+
 
 # Create connection engine
 engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
+    DATABASE_URL, connect_args={"check_same_thread": False}, **_engine_options(DATABASE_URL)
 )
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL))
+_configure(engine)
+_configure(async_engine.sync_engine)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay usable after commit: lazy loads cannot run outside run_sync()
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 # Base for the ORM models
 Base = declarative_base()
@@ -18,7 +110,9 @@ Base = declarative_base()
 # Function to initialize tables
 def init_db():
     from models import note  # Delayed import to avoid circular dependency
+    from services.search import init_search_index
     Base.metadata.create_all(bind=engine)
+    init_search_index(engine)
 
 # Dependency to inject database session
 def get_db():
@@ -26,4 +120,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency to inject an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
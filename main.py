@@ -1,14 +1,25 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from auth.hashing import password_hasher
 from database import init_db
-from routes import notes, user, auth, share
+from routes import notes, user, auth, share, metrics
 from routes.login import router as auth_router
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop the bcrypt workers with the app instead of leaving the pool behind
+    password_hasher.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 #Include Rotes
 app.include_router(auth_router)
 app.include_router(notes.router)
 app.include_router(user.router)
 app.include_router(auth.router)
 app.include_router(share.router)
+if metrics.METRICS_ENABLED:
+    app.include_router(metrics.router)
 init_db()
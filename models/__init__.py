@@ -1,3 +1,6 @@
 from .tag import Tag
 from .note_tags import note_tags
-from .note import Notes
\ No newline at end of file
+from .note import Notes
+from .note_counter import NoteCounter
+from .refresh_token import RefreshToken
+from .change_sequence import ChangeSequence
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String
+from database import Base
+
+class ChangeSequence(Base):
+    __tablename__ = "change_sequences"
+
+    # Bumped by services/changes.py on every write that can alter a listing:
+    # "notes" for the global listing, "user:<id>" for a user's own and
+    # shared-with-me listings
+    scope = Column(String, primary_key=True)
+    seq = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,70 @@
+import os
+import zlib
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+except ImportError:  # optional, pip install zstandard
+    zstandard = None
+
+load_dotenv()
+
+# Note bodies whose UTF-8 encoding reaches this many bytes are stored
+# compressed; shorter ones stay inline as plain text
+NOTE_COMPRESSION_THRESHOLD = int(os.getenv("NOTE_COMPRESSION_THRESHOLD", 4096))
+# "zlib", or "zstd" when the zstandard package is installed
+NOTE_COMPRESSION_CODEC = os.getenv("NOTE_COMPRESSION_CODEC", "zlib")
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+CODECS = ("zlib", "zstd")
+
+# What is stored for one body: (inline text, compressed bytes, codec marker).
+# Plain rows have no marker, which is also how rows written before
+# compression existed read back.
+Stored = Tuple[str, Optional[bytes], Optional[str]]
+
+
+def resolve_codec(name: Optional[str] = None) -> str:
+    name = name or NOTE_COMPRESSION_CODEC
+    if name not in CODECS:
+        raise ValueError(f"Unknown compression codec: {name}")
+    # Writing zstd needs the optional package; zlib is always there
+    if name == "zstd" and zstandard is None:
+        return "zlib"
+    return name
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Note body is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+def encode(text: str, codec: Optional[str] = None, threshold: Optional[int] = None) -> Stored:
+    # Bodies under the threshold, or that would not shrink, stay inline
+    raw = text.encode("utf-8")
+    if len(raw) < (NOTE_COMPRESSION_THRESHOLD if threshold is None else threshold):
+        return text, None, None
+    codec = resolve_codec(codec)
+    blob = compress(raw, codec)
+    if len(blob) >= len(raw):
+        return text, None, None
+    return "", blob, codec
+
+
+def decode(inline: str, blob: Optional[bytes], codec: Optional[str]) -> str:
+    if codec is None:
+        return inline
+    return decompress(blob, codec).decode("utf-8")
@@ -1,26 +1,95 @@
-from sqlalchemy import Column, DateTime, Integer, String, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, Boolean, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import deferred, relationship
 from database import Base
 from sqlalchemy.sql import func
 from models.note_tags import note_tags
+from models import compression
+
+# Characters of the body kept in Notes.preview
+PREVIEW_LENGTH = 200
 
 class Notes(Base):
     __tablename__ = "notes"
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
-    content = Column(String, nullable=False)
+    # The body is stored inline in the "content" column, or compressed in
+    # content_blob with its codec in content_codec ("" left inline); the
+    # `content` property below reads and writes either form
+    _content = Column("content", String, nullable=False)
+    content_blob = deferred(Column(LargeBinary, nullable=True))
+    content_codec = Column(String, nullable=True)
+    # Start of the body and its length, kept in step with `content` so the
+    # list views never read the full body (order_by=content sorts on preview)
+    preview = Column(String, nullable=False)
+    content_length = Column(Integer, nullable=False)
     important = Column(Boolean, default=False)
     updated_at  = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
     archived = Column(Boolean, default=False)
     owner_id = Column(Integer, ForeignKey("users.id"))
     pinned = Column(Boolean, default=False)
     favorite = Column(Boolean, default=False)
+    # Bumped on every write to the note or its tags; the note's ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     owner = relationship("User", back_populates="notes")
     shared_with = relationship("SharedNote", back_populates="note", cascade="all, delete")
     tags = relationship("Tag", secondary=note_tags, back_populates="notes")
 
+    @hybrid_property
+    def content(self) -> str:
+        # Decompressed on first access only (the blob is not loaded until
+        # then), and kept as long as the instance holds the same blob
+        if self.content_codec is None:
+            return self._content
+        blob = self.content_blob
+        decoded = getattr(self, "_decoded_content", None)
+        if decoded is None or decoded[0] is not blob:
+            decoded = (blob, compression.decode(self._content, blob, self.content_codec))
+            self._decoded_content = decoded
+        return decoded[1]
+
+    @content.inplace.setter
+    def _content_setter(self, value: str) -> None:
+        for name, column_value in self.stored_content(value).items():
+            setattr(self, name, column_value)
+        self._decoded_content = (self.content_blob, value)
+
+    @content.inplace.expression
+    @classmethod
+    def _content_expression(cls):
+        # SQL sees the inline column: LIKE and ORDER BY cannot look inside
+        # compressed bodies
+        return cls._content
+
+    @staticmethod
+    def stored_content(value: str) -> dict:
+        # Column values for `value`: the body (inline or compressed), its
+        # excerpt and its length. The setter writes these; Core/bulk INSERTs
+        # that bypass it pass them directly.
+        inline, blob, codec = compression.encode(value)
+        return {
+            "_content": inline,
+            "content_blob": blob,
+            "content_codec": codec,
+            "preview": value[:PREVIEW_LENGTH],
+            "content_length": len(value),
+        }
+
+    # One index per hot query shape: /mine and /pinned, /favorites, and the
+    # global listing (archived filter, pinned first). Titles are unique per
+    # owner; the index is what rejects a duplicate, on the write itself.
+    # AUTOINCREMENT: ids are never reused after a delete, so an ETag built
+    # from (id, version) cannot match a later note.
+    __table_args__ = (
+        Index("ix_notes_owner_archived_pinned_id", "owner_id", "archived", "pinned", "id"),
+        Index("ix_notes_owner_archived_favorite_id", "owner_id", "archived", "favorite", "id"),
+        Index("ix_notes_archived_pinned_id", "archived", "pinned", "id"),
+        Index("uq_notes_owner_title", "owner_id", "title", unique=True),
+        {"sqlite_autoincrement": True},
+    )
+
 class SharedNote(Base):
     __tablename__ = "shared_notes"
 
@@ -31,4 +100,11 @@ class SharedNote(Base):
     can_edit = Column(Boolean, default=False)
 
     note = relationship("Notes", back_populates="shared_with")
-    user = relationship("User", back_populates="shared_notes")
\ No newline at end of file
+    user = relationship("User", back_populates="shared_notes")
+
+    __table_args__ = (
+        # A note is shared at most once per recipient; also serves access checks
+        UniqueConstraint("note_id", "user_id", name="uq_shared_notes_note_user"),
+        # "Shared with me" listing
+        Index("ix_shared_notes_user_note", "user_id", "note_id"),
+    )
\ No newline at end of file
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from database import Base
+
+class NoteCounter(Base):
+    __tablename__ = "note_counters"
+
+    # One row per owner, kept in step with `notes` by services/counters.py
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    active = Column(Integer, nullable=False, default=0)
+    pinned = Column(Integer, nullable=False, default=0)
+    favorite = Column(Integer, nullable=False, default=0)
+    archived = Column(Integer, nullable=False, default=0)
+    shared_with_me = Column(Integer, nullable=False, default=0)
@@ -1,9 +1,11 @@
-from sqlalchemy import Table, Column, Integer, ForeignKey
+from sqlalchemy import Table, Column, Integer, ForeignKey, Index
 from database import Base
 
 note_tags = Table(
     "note_tags",
     Base.metadata,
-    Column("note_id", Integer, ForeignKey("notes.id")),
-    Column("tag_id", Integer, ForeignKey("tags.id"))
+    Column("note_id", Integer, ForeignKey("notes.id"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.id"), primary_key=True),
+    # The primary key covers note -> tags; this covers tag -> notes
+    Index("ix_note_tags_tag_note", "tag_id", "note_id"),
 )
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey
+from database import Base
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # HMAC-SHA256 of the token; the token itself is never stored
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+    # Every token rotated from the same login shares a family
+    family_id = Column(String(32), nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
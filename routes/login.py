@@ -1,27 +1,48 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from auth.users import get_user_by_username, verify_password
+from auth.users import get_user_by_username_async
+from auth.hashing import password_hasher
 from auth.jwt_handler import create_access_token
-from database import get_db
-from sqlalchemy.orm import Session
+from auth.refresh_tokens import issue_refresh_token, rotate_refresh_token, revoke_refresh_token
+from database import get_async_db
+from schemas.token import RefreshTokenRequest
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 router = APIRouter()
 
 @router.post("/token")
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = get_user_by_username(form_data.username,db)
+    user = await get_user_by_username_async(form_data.username, db)
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid Credentials"
         )
 
+    refresh_token = issue_refresh_token(db, user.id)
+    await db.commit()
     return {
         "access_token": create_access_token({"sub": user.username}),
+        "refresh_token": refresh_token,
         "token_type": "bearer"
     }
+
+# Exchange a refresh token for a new access token (no password, no bcrypt)
+@router.post("/token/refresh")
+async def refresh(request: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    username, refresh_token = await rotate_refresh_token(db, request.refresh_token)
+    return {
+        "access_token": create_access_token({"sub": username}),
+        "refresh_token": refresh_token,
+        "token_type": "bearer"
+    }
+
+@router.post("/token/revoke", status_code=204)
+async def revoke(request: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    await revoke_refresh_token(db, request.refresh_token)
+    return None
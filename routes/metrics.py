@@ -0,0 +1,28 @@
+import os
+from fastapi import APIRouter, Depends
+from dotenv import load_dotenv
+from auth.deps import get_current_user
+from auth.hashing import password_hasher
+from services import response_cache
+
+load_dotenv()
+
+# Operational counters, for signed-in users only. METRICS_ENABLED=false
+# leaves the routes out of the app altogether (see main.py).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"],
+    dependencies=[Depends(get_current_user)]
+)
+
+# Password hashing pool: queue depth, rejections and latency
+@router.get("/password-hashing")
+def password_hashing_metrics():
+    return password_hasher.metrics()
+
+# List response cache: size, hits, misses, evictions and invalidations
+@router.get("/response-cache")
+def response_cache_metrics():
+    return response_cache.stats()
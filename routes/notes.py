@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import  Optional
+from urllib.parse import urlencode
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import  List, Optional, Tuple
 from models.user import User
-from schemas.note import CreateNote, UpdatedNote, ResponseNote, PaginatedNotes
-from services import note_service
-from database import get_db
-from models.note import Notes, SharedNote
+from schemas.note import CreateNote, UpdatedNote, ResponseNote, NotePage, SearchPage, SparseNotes
+from schemas.batch import BatchRequest, BatchResponse
+from schemas.imports import ImportReport
+from schemas.tag import TagFacets
+from services import async_note_service, note_service, response_cache, export, imports, pagination
+from database import get_async_db
 from auth.deps import get_current_user
 
 
-VALID_ORDER_FIELDS = {"id", "title", "content", "important"}
+VALID_ORDER_FIELDS = set(pagination.SORT_COLUMNS)
 
 # Define the router with a prefix for all /notes endpoints
 router = APIRouter(
@@ -19,106 +23,137 @@ router = APIRouter(
 )
 
 
-# Get a single note by its ID
-@router.get("/{note_id}", response_model=ResponseNote)
-def get_note(
-    note_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    note = note_service.search_note(db, note_id)
-    if note is None:
-        raise HTTPException(status_code=404, detail="Note not found")
-
-    # Owner access
-    if note.owner_id == current_user.id:
-        return note
-
-    # Shared access
-    shared = db.query(SharedNote).filter_by(
-        note_id=note_id,
-        user_id=current_user.id
-    ).first()
-
-    if shared:
-        return note
+# Sparse fieldsets for the list routes: only the selected columns are read
+def note_fields(
+    fields: Optional[str] = Query(None, description="Comma-separated note fields to return, e.g. id,title,pinned"),
+    view: Optional[str] = Query(
+        None, pattern="^(full|summary|preview)$",
+        description="'summary' returns every field but content, 'preview' adds the first characters and the length"
+    )
+) -> Optional[List[str]]:
+    return note_service.parse_fields(fields, view)
+
+def list_response(page, cache_key: Tuple[str, str]) -> Response:
+    # Pages are serialized once, here, and kept in the response cache.
+    # Sparse pages hold only the requested keys.
+    etag, scope = cache_key
+    body = page.model_dump_json(exclude_unset=isinstance(page, SparseNotes)).encode()
+    response_cache.store(etag, scope, body)
+    return json_page(body, etag)
+
+def json_page(body: bytes, etag: str) -> Response:
+    return Response(body, media_type="application/json", headers=cache_headers(etag))
+
+
+# Conditional GETs: reads carry a strong ETag and must be revalidated;
+# a matching If-None-Match gets a 304 from one indexed lookup, before the
+# query and serialization run
+CACHE_CONTROL = "private, no-cache"
+
+def cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    header = request.headers.get("if-none-match")
+    if etag is None or header is None:
+        return None
+    if header.strip() == "*" or etag in (tag.strip() for tag in header.split(",")):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return None
 
-    # Access denied
-    raise HTTPException(status_code=403, detail="You don't have access to this note")
+async def list_lookup(
+    request: Request, db: AsyncSession, user_id: int, global_scope: bool = False
+) -> Tuple[Tuple[str, str], Optional[Response]]:
+    # ((etag, scope), response to send right away): a 304, or the page
+    # from the response cache; None means the listing has to run
+    query = urlencode(sorted(request.query_params.multi_items()))
+    etag = await async_note_service.list_etag(db, user_id, request.url.path, query, global_scope=global_scope)
+    early = not_modified(request, etag)
+    if early is None:
+        body = response_cache.lookup(etag)
+        if body is not None:
+            early = json_page(body, etag)
+    return (etag, note_service.list_scope(user_id, global_scope)), early
 
 
 # Create a new note
 @router.post("/", response_model=ResponseNote, status_code=201)
-def create_note(
+async def create_note(
     note: CreateNote,
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)
 ):
-    # Check if a note with the same title already exists
-    existing_note = db.query(Notes).filter(Notes.title == note.title).first()
-    if existing_note:
-        raise HTTPException(status_code=409, detail="Note with this title already exists")
+    # Duplicate titles (per owner) are rejected by the insert itself with a 409
 
     # Example of validation logic: block certain words in title
     if "forbidden" in note.title.lower():
         raise HTTPException(status_code=400, detail="Title contains forbidden word")
 
-    return note_service.create_note(db, note, owner_id=current_user.id)
+    return await async_note_service.create_note(db, note, owner_id=current_user.id)
+
+# Apply many create/patch/delete/flag operations in one transaction
+@router.post("/batch", response_model=BatchResponse)
+async def batch_notes(
+    request: BatchRequest,
+    db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)
+):
+    results = await async_note_service.apply_batch(db, request.operations, current_user.id)
+    return BatchResponse(results=results)
+
+# Import notes from an NDJSON or CSV request body, read as it streams in and
+# committed batch_size records at a time; rejected records are reported by line
+@router.post("/import", response_model=ImportReport)
+async def import_notes(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv with a header row"),
+    batch_size: int = Query(imports.IMPORT_BATCH_SIZE, ge=1, le=imports.MAX_IMPORT_BATCH_SIZE),
+    db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)
+):
+    return await imports.import_notes(db, request.stream(), current_user.id, format, batch_size)
 
 # Update an entire note by ID
 @router.put("/{note_id}", response_model=ResponseNote)
-def update_note(
+async def update_note(
     note_id: int,
     note_data: UpdatedNote,
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: str = Depends(get_current_user)
 ):
-    # Search note first
-    note = db.query(Notes).filter(Notes.id == note_id).first()
-
-    if note is None:
-        raise HTTPException(status_code=404, detail="Note not found")
-    # If owner, can edit
-    if note.owner_id == current_user.id:
-        return note_service.update_note(db, note, note_data)
-    # Otherwise, check if the note was shared with editing permission.
-    shared = db.query(SharedNote).filter_by(
-        note_id=note_id,
-        user_id=current_user.id,
-        can_edit=True
-    ).first()
-
-    if shared:
-        return note_service.update_note(db, note, note_data)
-
-    raise HTTPException(status_code=403, detail="You dont have permission to edit this note")
+    # The owner and users it was shared with for editing may edit
+    note = await async_note_service.authorize_note(
+        db, note_id, current_user.id, note_service.ACCESS_EDITOR, "You dont have permission to edit this note"
+    )
+    return await async_note_service.update_note(db, note, note_data)
 
 # Patch specific fields of a note
 @router.patch("/{note_id}", response_model=ResponseNote)
-def patch_note(
+async def patch_note(
     note_id: int,
     note_update: UpdatedNote,
-    db: Session = Depends(get_db), current_user: str = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)
 ):
-    patched = note_service.patch_note(db, note_id, note_update)
-    if patched is None:
-        raise HTTPException(status_code=404, detail="Note not found")
-    return patched
+    note = await async_note_service.authorize_note(
+        db, note_id, current_user.id, note_service.ACCESS_EDITOR, "You dont have permission to edit this note"
+    )
+    return await async_note_service.patch_note(db, note, note_update)
 
 # Delete a note by ID
 @router.delete("/{note_id}", status_code=204)
-def delete_note(
+async def delete_note(
     note_id: int,
-    db: Session = Depends(get_db), current_user: str = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)
 ):
-    success = note_service.delete_note(db, note_id)
-    if not success:
-        raise HTTPException(status_code=404, detail="Note not found")
+    note = await async_note_service.authorize_note(
+        db, note_id, current_user.id, note_service.ACCESS_OWNER, "You do not own this note"
+    )
+    await async_note_service.delete_note(db, note)
     return None
     
-@router.get("/", response_model=PaginatedNotes)
-def list_notes(
+@router.get("/", response_model=SearchPage)
+async def list_notes(
+    request: Request,
     q: Optional[str] = Query(None, description="Search in title or content"),
-    tag: Optional[str] = Query(None, description="Filter by tag name"),
+    tag: Optional[List[str]] = Query(None, description="Filter by tag name; repeat for several tags"),
+    tag_mode: str = Query("all", pattern="^(all|any|none)$", description="Notes with all, any or none of the tags"),
     favorite: Optional[bool] = Query(None, description="Filter by favorite"),
     pinned: Optional[bool] = Query(None, description="Filter by pinned"),
     archived: Optional[bool] = Query(False, description="Include archived notes"),
@@ -126,193 +161,248 @@ def list_notes(
     offset: int = Query(0, ge=0),
     order_by: str = Query("id", description="Column to sort by"),
     order: str = Query("asc", pattern="^(asc|desc)$", description="Sort order"),
-    db: Session = Depends(get_db),
+    sort: Optional[str] = Query(None, pattern="^relevance$", description="Use 'relevance' to rank search results by BM25"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor"),
+    include_total: bool = Query(True, description="Set to false to skip computing total"),
+    fields: Optional[List[str]] = Depends(note_fields),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user)
 ):
     if order_by not in VALID_ORDER_FIELDS:
         raise HTTPException(status_code=422, detail=f"Invalid order_by field: {order_by}")
 
-    return note_service.list_notes_paginated(
+    cache_key, early = await list_lookup(request, db, current_user.id, global_scope=True)
+    if early:
+        return early
+    return list_response(await async_note_service.list_notes_paginated(
         db=db,
         q=q,
         tag=tag,
+        tag_mode=tag_mode,
         favorite=favorite,
         pinned=pinned,
         show_archived=archived,
         limit=limit,
         offset=offset,
         order_by=order_by,
-        order=order
-    )
+        order=order,
+        sort=sort,
+        cursor=cursor,
+        include_total=include_total,
+        fields=fields
+    ), cache_key)
 @router.patch("/{note_id}/pin", response_model=ResponseNote)
-def pin_note(
+async def pin_note(
     note_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user)
 ):
-    note = db.query(Notes).filter(Notes.id == note_id).first()
-    if not note:
-        raise HTTPException(status_code=404, detail="Note not found")
-    if note.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="You do not own this note")
-
-    note.pinned = True
-    db.commit()
-    db.refresh(note)
-    return ResponseNote.model_validate(note)
+    note = await async_note_service.authorize_note(
+        db, note_id, current_user.id, note_service.ACCESS_OWNER, "You do not own this note"
+    )
+
+    return await async_note_service.set_flag(db, note, "pinned", True)
 
 
 @router.patch("/{note_id}/unpin", response_model=ResponseNote)
-def unpin_note(
+async def unpin_note(
     note_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user)
 ):
-    note = db.query(Notes).filter(Notes.id == note_id).first()
-    if not note:
-        raise HTTPException(status_code=404, detail="Note not found")
-    if note.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="You do not own this note")
-
-    note.pinned = False
-    db.commit()
-    db.refresh(note)
-    return ResponseNote.model_validate(note)
+    note = await async_note_service.authorize_note(
+        db, note_id, current_user.id, note_service.ACCESS_OWNER, "You do not own this note"
+    )
+
+    return await async_note_service.set_flag(db, note, "pinned", False)
 
-@router.get("/pinned", response_model=PaginatedNotes)
-def list_pinned_notes(
+@router.get("/pinned", response_model=NotePage)
+async def list_pinned_notes(
+    request: Request,
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor"),
+    include_total: bool = Query(True, description="Set to false to skip computing total"),
+    fields: Optional[List[str]] = Depends(note_fields),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user)
 ):
-    from models.note import Notes
-
-    query = db.query(Notes).filter(
-        Notes.owner_id == current_user.id,
-        Notes.pinned == True,
-        Notes.archived == False
-    )
-
-    total = query.count()
-    notes = query.order_by(Notes.id.desc()).offset(offset).limit(limit).all()
-
-    return PaginatedNotes(
-        total=total,
-        limit=limit,
-        offset=offset,
-        data=notes
-    )
+    cache_key, early = await list_lookup(request, db, current_user.id)
+    if early:
+        return early
+    return list_response(await async_note_service.list_owned_notes(
+        db, current_user.id, pinned=True, limit=limit, offset=offset, cursor=cursor,
+        include_total=include_total, fields=fields
+    ), cache_key)
 
 @router.patch("/{note_id}/favorite", response_model=ResponseNote)
-def favorite_note(
+async def favorite_note(
     note_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user)
 ):
-    note = db.query(Notes).filter(Notes.id == note_id).first()
-    if not note:
-        raise HTTPException(status_code=404, detail="Note not found")
-    if note.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="You do not own this note")
-
-    note.favorite = True
-    db.commit()
-    db.refresh(note)
-    return ResponseNote.model_validate(note)
+    note = await async_note_service.authorize_note(
+        db, note_id, current_user.id, note_service.ACCESS_OWNER, "You do not own this note"
+    )
+
+    return await async_note_service.set_flag(db, note, "favorite", True)
 
 
 @router.patch("/{note_id}/unfavorite", response_model=ResponseNote)
-def unfavorite_note(
+async def unfavorite_note(
     note_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user)
 ):
-    note = db.query(Notes).filter(Notes.id == note_id).first()
-    if not note:
-        raise HTTPException(status_code=404, detail="Note not found")
-    if note.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="You do not own this note")
-
-    note.favorite = False
-    db.commit()
-    db.refresh(note)
-    return ResponseNote.model_validate(note)
+    note = await async_note_service.authorize_note(
+        db, note_id, current_user.id, note_service.ACCESS_OWNER, "You do not own this note"
+    )
+
+    return await async_note_service.set_flag(db, note, "favorite", False)
 
-@router.get("/favorites", response_model=PaginatedNotes)
-def list_favorite_notes(
+@router.get("/favorites", response_model=NotePage)
+async def list_favorite_notes(
+    request: Request,
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor"),
+    include_total: bool = Query(True, description="Set to false to skip computing total"),
+    fields: Optional[List[str]] = Depends(note_fields),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user)
 ):
-    from models.note import Notes
-
-    query = db.query(Notes).filter(
-        Notes.owner_id == current_user.id,
-        Notes.favorite == True,
-        Notes.archived == False
-    )
-
-    total = query.count()
-    notes = query.order_by(Notes.id.desc()).offset(offset).limit(limit).all()
-
-    return PaginatedNotes(
-        total=total,
-        limit=limit,
-        offset=offset,
-        data=notes
-    )
-
-@router.get("/shared", response_model=PaginatedNotes)
-def list_shared_notes(
+    cache_key, early = await list_lookup(request, db, current_user.id)
+    if early:
+        return early
+    return list_response(await async_note_service.list_owned_notes(
+        db, current_user.id, favorite=True, limit=limit, offset=offset, cursor=cursor,
+        include_total=include_total, fields=fields
+    ), cache_key)
+
+@router.get("/shared", response_model=SearchPage)
+async def list_shared_notes(
+    request: Request,
+    q: Optional[str] = Query(None, description="Search in title or content"),
+    tag: Optional[List[str]] = Query(None, description="Filter by tag name; repeat for several tags"),
+    tag_mode: str = Query("all", pattern="^(all|any|none)$", description="Notes with all, any or none of the tags"),
+    favorite: Optional[bool] = Query(None, description="Filter by favorite"),
+    archived: bool = Query(False, description="List archived notes instead"),
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor"),
+    include_total: bool = Query(True, description="Set to false to skip computing total"),
+    fields: Optional[List[str]] = Depends(note_fields),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user)
 ):
-    from models.note import Notes, SharedNote
-
-    # Buscar IDs das notas compartilhadas comigo
-    shared_ids = db.query(SharedNote.note_id).filter(
-        SharedNote.user_id == current_user.id
-    )
-
-    query = db.query(Notes).filter(
-        Notes.id.in_(shared_ids),
-        Notes.archived == False  # Não mostra arquivadas
-    )
-
-    total = query.count()
-    notes = query.order_by(Notes.pinned.desc(), Notes.id.desc()).offset(offset).limit(limit).all()
-
-    return PaginatedNotes(
-        total=total,
-        limit=limit,
-        offset=offset,
-        data=notes
-    )
-
-@router.get("/mine", response_model=PaginatedNotes)
-def list_my_notes(
+    cache_key, early = await list_lookup(request, db, current_user.id)
+    if early:
+        return early
+    return list_response(await async_note_service.list_shared_notes(
+        db, current_user.id, q=q, tag=tag, tag_mode=tag_mode, favorite=favorite, archived=archived,
+        limit=limit, offset=offset, cursor=cursor, include_total=include_total, fields=fields
+    ), cache_key)
+
+# The user's own notes and the ones shared with them, in one listing
+@router.get("/visible", response_model=SearchPage)
+async def list_visible_notes(
+    request: Request,
+    q: Optional[str] = Query(None, description="Search in title or content"),
+    tag: Optional[List[str]] = Query(None, description="Filter by tag name; repeat for several tags"),
+    tag_mode: str = Query("all", pattern="^(all|any|none)$", description="Notes with all, any or none of the tags"),
+    favorite: Optional[bool] = Query(None, description="Filter by favorite"),
+    archived: bool = Query(False, description="List archived notes instead"),
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor"),
+    include_total: bool = Query(True, description="Set to false to skip computing total"),
+    fields: Optional[List[str]] = Depends(note_fields),
+    db: AsyncSession = Depends(get_async_db),
     current_user: str = Depends(get_current_user)
 ):
-    from models.note import Notes
-
-    query = db.query(Notes).filter(
-        Notes.owner_id == current_user.id,
-        Notes.archived == False
+    cache_key, early = await list_lookup(request, db, current_user.id)
+    if early:
+        return early
+    return list_response(await async_note_service.list_visible_notes(
+        db, current_user.id, q=q, tag=tag, tag_mode=tag_mode, favorite=favorite, archived=archived,
+        limit=limit, offset=offset, cursor=cursor, include_total=include_total, fields=fields
+    ), cache_key)
+
+@router.get("/mine", response_model=NotePage)
+async def list_my_notes(
+    request: Request,
+    archived: bool = Query(False, description="List archived notes instead"),
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor"),
+    include_total: bool = Query(True, description="Set to false to skip computing total"),
+    fields: Optional[List[str]] = Depends(note_fields),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user)
+):
+    cache_key, early = await list_lookup(request, db, current_user.id)
+    if early:
+        return early
+    return list_response(await async_note_service.list_owned_notes(
+        db, current_user.id, archived=archived, limit=limit, offset=offset, cursor=cursor,
+        include_total=include_total, fields=fields
+    ), cache_key)
+
+# Tags of the user's notes with their note counts, for a tag sidebar.
+# Cached and revalidated like the listings, under the user's scope.
+@router.get("/tags", response_model=TagFacets)
+async def list_tag_facets(
+    request: Request,
+    q: Optional[str] = Query(None, description="Search in title or content"),
+    tag: Optional[List[str]] = Query(None, description="Filter by tag name; repeat for several tags"),
+    tag_mode: str = Query("all", pattern="^(all|any|none)$", description="Notes with all, any or none of the tags"),
+    favorite: Optional[bool] = Query(None, description="Filter by favorite"),
+    pinned: Optional[bool] = Query(None, description="Filter by pinned"),
+    archived: bool = Query(False, description="Count archived notes instead"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user)
+):
+    cache_key, early = await list_lookup(request, db, current_user.id)
+    if early:
+        return early
+    return list_response(await async_note_service.tag_facets(
+        db, current_user.id, q=q, tag=tag, tag_mode=tag_mode, favorite=favorite, pinned=pinned, archived=archived
+    ), cache_key)
+
+# Stream every note of the user, with tags and shares, as NDJSON or CSV
+@router.get("/export")
+async def export_notes(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    archived: Optional[bool] = Query(None, description="Only archived (true) or active (false) notes; all by default"),
+    current_user: User = Depends(get_current_user)
+):
+    media_type, filename = export.EXPORT_FORMATS[format]
+    return StreamingResponse(
+        export.stream_export(current_user.id, format, archived),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
-    total = query.count()
-    notes = query.order_by(Notes.pinned.desc(), Notes.id.desc()).offset(offset).limit(limit).all()
-
-    return PaginatedNotes(
-        total=total,
-        limit=limit,
-        offset=offset,
-        data=notes
+# Get a single note by its ID. Declared after the static GET routes
+# (/mine, /shared, ...) so they are not captured by {note_id}
+@router.get("/{note_id}", response_model=ResponseNote)
+async def get_note(
+    note_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Revalidation only reads the version; the ETag is only found for notes
+    # the user can read, so a 304 never skips the access check
+    if "if-none-match" in request.headers:
+        cached = not_modified(request, await async_note_service.note_etag(db, note_id, current_user.id))
+        if cached:
+            return cached
+
+    # Owner or any share
+    note = await async_note_service.authorize_note(
+        db, note_id, current_user.id, note_service.ACCESS_READER, "You don't have access to this note", full=True
     )
+    response.headers.update(cache_headers(note_service.version_etag(note.id, note.version)))
+    return ResponseNote.model_validate(note)
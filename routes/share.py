@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from models.note import Notes
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.user import User
-from database import get_db
-from services import note_service
+from database import get_async_db
+from services import async_note_service, note_service
 from schemas.shared import ShareNoteRequest
 from auth.deps import get_current_user
 
@@ -11,21 +11,17 @@ from auth.deps import get_current_user
 router = APIRouter()
 
 @router.post("/notes/{note_id}/share")
-def share_note(
+async def share_note(
     note_id: int,
     request: ShareNoteRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    note = db.query(Notes).filter(Notes.id == note_id).first()
-    if not note:
-        raise HTTPException(status_code=404, detail="Note not found")
-    if note.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Only the owner can share the note")
-    recipient = db.query(User).filter(User.username == request.recipient_username).first()
+    note = await async_note_service.authorize_note(
+        db, note_id, current_user.id, note_service.ACCESS_OWNER, "Only the owner can share the note"
+    )
+    recipient = await db.scalar(select(User).where(User.username == request.recipient_username).limit(1))
     if not recipient:
         raise HTTPException(status_code=404, detail="Recipient not found")
-    success = note_service.share_note(db, note_id, recipient.id, request.can_edit)
-    if not success:
-        raise HTTPException(status_code=400, detail="Failed to share note")
-    return {"message": "Note shared successfully"}
\ No newline at end of file
+    await async_note_service.share_note(db, note, recipient.id, request.can_edit)
+    return {"message": "Note shared successfully"}
@@ -0,0 +1,41 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, model_validator
+from schemas.note import CreateNote, UpdatedNote, ResponseNote
+
+MAX_BATCH_OPERATIONS = 500
+
+BatchOp = Literal[
+    "create", "patch", "delete",
+    "pin", "unpin", "favorite", "unfavorite", "archive", "unarchive"
+]
+
+class BatchOperation(BaseModel):
+    op: BatchOp
+    note_id: Optional[int] = None
+    note: Optional[CreateNote] = None
+    update: Optional[UpdatedNote] = None
+
+    @model_validator(mode="after")
+    def check_payload(self):
+        if self.op == "create":
+            if self.note is None:
+                raise ValueError("create requires 'note'")
+        elif self.note_id is None:
+            raise ValueError(f"{self.op} requires 'note_id'")
+        if self.op == "patch" and self.update is None:
+            raise ValueError("patch requires 'update'")
+        return self
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(min_length=1, max_length=MAX_BATCH_OPERATIONS)
+
+class BatchResult(BaseModel):
+    index: int
+    op: BatchOp
+    status: int
+    note_id: Optional[int] = None
+    note: Optional[ResponseNote] = None
+    detail: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchResult]
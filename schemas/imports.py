@@ -0,0 +1,13 @@
+from typing import List
+from pydantic import BaseModel
+
+class ImportLineError(BaseModel):
+    line: int
+    detail: str
+
+class ImportReport(BaseModel):
+    # `failed` counts every rejected record; `errors` lists the first
+    # MAX_REPORTED_ERRORS of them
+    imported: int
+    failed: int
+    errors: List[ImportLineError]
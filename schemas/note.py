@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 from pydantic import BaseModel, ConfigDict, Field
 from schemas.tag import Tag
 
@@ -33,8 +33,59 @@ class ResponseNote(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class SearchNote(ResponseNote):
+    # A full-text match: the body excerpt around the terms, None when the
+    # search fell back to LIKE
+    snippet: Optional[str] = None
+
 class PaginatedNotes(BaseModel):
-    total: int
+    total: Optional[int]
     limit: int
     offset: int
-    data: List[ResponseNote]
\ No newline at end of file
+    data: List[ResponseNote]
+    next_cursor: Optional[str] = None
+
+class SearchResults(PaginatedNotes):
+    data: List[SearchNote]
+
+# Note fields a list request can select with fields=, and the named views:
+# summary is every field but the body, preview swaps the body for its
+# stored excerpt and length
+NOTE_FIELDS = (
+    "id", "title", "content", "preview", "content_length", "important",
+    "tags", "archived", "owner_id", "pinned", "favorite"
+)
+SUMMARY_FIELDS = ("id", "title", "important", "tags", "archived", "owner_id", "pinned", "favorite")
+NOTE_VIEWS = {
+    "summary": SUMMARY_FIELDS,
+    "preview": SUMMARY_FIELDS + ("preview", "content_length"),
+}
+
+class SparseNote(BaseModel):
+    # Only the selected fields are set; unset ones are left out of the JSON
+    id: int
+    title: Optional[str] = None
+    content: Optional[str] = None
+    preview: Optional[str] = None
+    content_length: Optional[int] = None
+    important: Optional[bool] = None
+    tags: Optional[List[Tag]] = None
+    archived: Optional[bool] = None
+    owner_id: Optional[int] = None
+    pinned: Optional[bool] = None
+    favorite: Optional[bool] = None
+    snippet: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class SparseNotes(BaseModel):
+    total: Optional[int]
+    limit: int
+    offset: int
+    data: List[SparseNote]
+    next_cursor: Optional[str] = None
+
+# What a list route returns: the full page, or the sparse one when the
+# request selects fields= or view=; routes taking q= also return SearchResults
+NotePage = Union[PaginatedNotes, SparseNotes]
+SearchPage = Union[SearchResults, PaginatedNotes, SparseNotes]
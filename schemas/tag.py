@@ -1,3 +1,4 @@
+from typing import List
 from pydantic import BaseModel, ConfigDict
 
 class TagBase(BaseModel):
@@ -10,4 +11,10 @@ class Tag(BaseModel):
     id: int
     name: str
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class TagCount(Tag):
+    count: int
+
+class TagFacets(BaseModel):
+    data: List[TagCount]
@@ -0,0 +1,61 @@
+from typing import List, Optional, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.note import Notes
+from schemas.batch import BatchOperation, BatchResult
+from schemas.note import CreateNote, UpdatedNote, ResponseNote, PaginatedNotes, SparseNotes
+from schemas.tag import TagFacets
+from services import note_service, batch_service
+
+# Async entry points for the routes. The query logic lives once, in the sync
+# services; AsyncSession.run_sync() runs it over the aiosqlite connection, so
+# the event loop awaits the driver instead of blocking a threadpool worker.
+
+async def list_notes_paginated(db: AsyncSession, **filters) -> Union[PaginatedNotes, SparseNotes]:
+    return await db.run_sync(note_service.list_notes_paginated, **filters)
+
+async def list_owned_notes(db: AsyncSession, owner_id: int, **filters) -> Union[PaginatedNotes, SparseNotes]:
+    return await db.run_sync(note_service.list_owned_notes, owner_id, **filters)
+
+async def list_shared_notes(db: AsyncSession, user_id: int, **filters) -> Union[PaginatedNotes, SparseNotes]:
+    return await db.run_sync(note_service.list_shared_notes, user_id, **filters)
+
+async def list_visible_notes(db: AsyncSession, user_id: int, **filters) -> Union[PaginatedNotes, SparseNotes]:
+    return await db.run_sync(note_service.list_visible_notes, user_id, **filters)
+
+async def tag_facets(db: AsyncSession, user_id: int, **filters) -> TagFacets:
+    return await db.run_sync(note_service.tag_facets, user_id, **filters)
+
+async def create_note(db: AsyncSession, note: CreateNote, owner_id: int) -> ResponseNote:
+    return await db.run_sync(note_service.create_note, note, owner_id)
+
+async def search_note(db: AsyncSession, note_id: int) -> Optional[ResponseNote]:
+    return await db.run_sync(note_service.search_note, note_id)
+
+async def authorize_note(
+    db: AsyncSession, note_id: int, user_id: int, required: str, detail: str, full: bool = False
+) -> Notes:
+    return await db.run_sync(note_service.authorize_note, note_id, user_id, required, detail, full)
+
+async def note_etag(db: AsyncSession, note_id: int, user_id: int) -> Optional[str]:
+    return await db.run_sync(note_service.note_etag, note_id, user_id)
+
+async def list_etag(db: AsyncSession, user_id: int, path: str, query: str, global_scope: bool = False) -> str:
+    return await db.run_sync(note_service.list_etag, user_id, path, query, global_scope)
+
+async def update_note(db: AsyncSession, note: Notes, updated: UpdatedNote) -> Optional[ResponseNote]:
+    return await db.run_sync(note_service.update_note, note, updated)
+
+async def patch_note(db: AsyncSession, note: Notes, updated: UpdatedNote) -> ResponseNote:
+    return await db.run_sync(note_service.patch_note, note, updated)
+
+async def delete_note(db: AsyncSession, note: Notes) -> None:
+    await db.run_sync(note_service.delete_note, note)
+
+async def set_flag(db: AsyncSession, note: Notes, field: str, value: bool) -> ResponseNote:
+    return await db.run_sync(note_service.set_flag, note, field, value)
+
+async def share_note(db: AsyncSession, note: Notes, target_user_id: int, can_edit: bool) -> None:
+    await db.run_sync(note_service.share_note, note, target_user_id, can_edit)
+
+async def apply_batch(db: AsyncSession, operations: List[BatchOperation], user_id: int) -> List[BatchResult]:
+    return await db.run_sync(batch_service.apply_batch, operations, user_id)
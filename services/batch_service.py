@@ -0,0 +1,220 @@
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session, selectinload
+from models.note import Notes, SharedNote
+from models.note_tags import note_tags
+from schemas.batch import BatchOperation, BatchResult
+from schemas.note import ResponseNote
+from services import counters, tags
+from services import changes as list_changes
+from services.note_service import apply_update, content_fields, title_conflict
+
+# Flag operations and the (field, value) they set
+FLAG_OPS = {
+    "pin": ("pinned", True),
+    "unpin": ("pinned", False),
+    "favorite": ("favorite", True),
+    "unfavorite": ("favorite", False),
+    "archive": ("archived", True),
+    "unarchive": ("archived", False),
+}
+FLAG_FIELDS = ("pinned", "favorite", "archived")
+
+
+def apply_batch(db: Session, operations: List[BatchOperation], user_id: int) -> List[BatchResult]:
+    # Run all operations in one transaction with set-based statements.
+    # Operations are validated in request order; each gets its own status and
+    # a failing item does not stop the others.
+    results = [BatchResult(index=i, op=op.op, status=200) for i, op in enumerate(operations)]
+
+    # Everything referenced by id, plus the caller's edit shares, in two queries
+    note_ids = {op.note_id for op in operations if op.note_id is not None}
+    notes: Dict[int, Notes] = {}
+    editable: Set[int] = set()
+    if note_ids:
+        notes = {note.id: note for note in db.query(Notes).filter(Notes.id.in_(note_ids))}
+        editable = {row.note_id for row in db.query(SharedNote.note_id).filter(
+            SharedNote.user_id == user_id,
+            SharedNote.can_edit == True,
+            SharedNote.note_id.in_(note_ids)
+        )}
+    before = {note_id: counters.snapshot(note) for note_id, note in notes.items()}
+
+    # Final flag values per note, last operation wins
+    flags: Dict[int, Dict[str, bool]] = {}
+    patched: Dict[int, List[int]] = {}
+    deleted: List[int] = []
+    creates: List[int] = []
+
+    # Titles are unique per owner: the (owner, title) pairs the creates and
+    # renames ask for, looked up in one query, so a duplicate fails alone
+    # instead of the whole INSERT or flush. Titles held before the batch
+    # stay reserved until it commits, even if a note is renamed away.
+    wanted = {(user_id, op.note.title) for op in operations if op.op == "create"} | {
+        (notes[op.note_id].owner_id, op.update.title) for op in operations
+        if op.op == "patch" and op.note_id in notes and op.update.title is not None
+    }
+    taken: Dict[Tuple[Optional[int], str], int] = {}
+    if wanted:
+        taken = {(row.owner_id, row.title): row.id for row in db.query(Notes.id, Notes.owner_id, Notes.title).filter(
+            Notes.owner_id.in_({owner_id for owner_id, _ in wanted}),
+            Notes.title.in_({title for _, title in wanted})
+        )}
+    # Titles claimed earlier in this batch, by note id (None for a create)
+    claimed: Dict[Tuple[Optional[int], str], Optional[int]] = {}
+
+    for i, op in enumerate(operations):
+        result = results[i]
+        if op.op == "create":
+            title = op.note.title
+            if "forbidden" in title.lower():
+                result.status, result.detail = 400, "Title contains forbidden word"
+            elif (user_id, title) in taken or (user_id, title) in claimed:
+                result.status, result.detail = 409, "Note with this title already exists"
+            else:
+                claimed[(user_id, title)] = None
+                creates.append(i)
+                result.status = 201
+            continue
+
+        result.note_id = op.note_id
+        note = notes.get(op.note_id)
+        if note is None or op.note_id in deleted:
+            result.status, result.detail = 404, "Note not found"
+            continue
+        is_owner = note.owner_id == user_id
+        if op.op == "patch":
+            if not (is_owner or op.note_id in editable):
+                result.status, result.detail = 403, "You dont have permission to edit this note"
+                continue
+            if op.update.title is not None:
+                key = (note.owner_id, op.update.title)
+                if taken.get(key, note.id) != note.id or claimed.get(key, note.id) != note.id:
+                    result.status, result.detail = 409, "Note with this title already exists"
+                    continue
+                claimed[key] = note.id
+            patched.setdefault(op.note_id, []).append(i)
+            for field in FLAG_FIELDS:
+                value = getattr(op.update, field)
+                if value is not None:
+                    flags.setdefault(op.note_id, {})[field] = value
+        elif not is_owner:
+            result.status, result.detail = 403, "You do not own this note"
+        elif op.op == "delete":
+            deleted.append(op.note_id)
+            result.status = 204
+        else:
+            field, value = FLAG_OPS[op.op]
+            flags.setdefault(op.note_id, {})[field] = value
+
+    changes = []
+    with title_conflict(db):
+        created_ids = insert_notes(db, [operations[i].note for i in creates], user_id)
+    for i, note_id in zip(creates, created_ids):
+        results[i].note_id = note_id
+        changes.append((note_id, user_id, None, counters.snapshot(operations[i].note)))
+
+    # Patches: scalar fields through the ORM (one flush), tags in bulk
+    retagged = {}
+    for note_id, indexes in patched.items():
+        if note_id in deleted:
+            continue
+        for i in indexes:
+            update_data = operations[i].update
+            apply_update(db, notes[note_id], update_data, include_tags=False)
+            if update_data.tags is not None:
+                retagged[note_id] = update_data.tags
+        # The flags are written below as set-based UPDATEs
+        for field in FLAG_FIELDS:
+            setattr(notes[note_id], field, before[note_id][field])
+    # Renames were checked above; only a concurrent write can still collide
+    with title_conflict(db):
+        db.flush()
+    _replace_tags(db, retagged)
+
+    # Flags: one UPDATE ... WHERE id IN (...) per (field, value)
+    groups: Dict[tuple, List[int]] = {}
+    for note_id, values in flags.items():
+        if note_id in deleted:
+            continue
+        for field, value in values.items():
+            groups.setdefault((field, value), []).append(note_id)
+    for (field, value), ids in groups.items():
+        db.execute(
+            update(Notes).where(Notes.id.in_(ids)).values({field: value, "version": Notes.version + 1})
+            .execution_options(synchronize_session=False)
+        )
+    for note_id in set(patched) | set(flags):
+        if note_id not in deleted:
+            after = dict(before[note_id], **flags.get(note_id, {}))
+            changes.append((note_id, notes[note_id].owner_id, before[note_id], after))
+
+    # Deletes: counters first, recipients are found through shared_notes
+    for note_id in deleted:
+        changes.append((note_id, notes[note_id].owner_id, before[note_id], None))
+    counters.notes_changed(db, changes)
+    list_changes.notes_changed(db, [(note_id, owner_id) for note_id, owner_id, _, _ in changes])
+    if deleted:
+        db.execute(delete(SharedNote).where(SharedNote.note_id.in_(deleted)))
+        db.execute(delete(note_tags).where(note_tags.c.note_id.in_(deleted)))
+        db.execute(delete(Notes).where(Notes.id.in_(deleted)).execution_options(synchronize_session=False))
+        for note_id in deleted:
+            db.expunge(notes[note_id])
+
+    db.commit()
+    _attach_notes(db, results)
+    return results
+
+
+def insert_notes(db: Session, new_notes: list, owner_id: int) -> List[int]:
+    # Bulk INSERT ... RETURNING id, then tags for all of them
+    if not new_notes:
+        return []
+    rows = [{
+        "title": note.title,
+        **content_fields(note.content),
+        "important": note.important,
+        "archived": note.archived,
+        "owner_id": owner_id,
+        "pinned": note.pinned,
+        "favorite": note.favorite,
+    } for note in new_notes]
+    ids = list(db.scalars(
+        insert(Notes).returning(Notes.id, sort_by_parameter_order=True), rows
+    ))
+    _replace_tags(db, {note_id: note.tags for note_id, note in zip(ids, new_notes)}, replace=False)
+    return ids
+
+
+def _replace_tags(db: Session, names_by_note: Dict[int, List[str]], replace: bool = True) -> None:
+    if not names_by_note:
+        return
+    resolved = {tag.name: tag for tag in tags.resolve_tags(
+        db, [name for names in names_by_note.values() for name in names]
+    )}
+    if replace:
+        db.execute(delete(note_tags).where(note_tags.c.note_id.in_(list(names_by_note))))
+    rows = [
+        {"note_id": note_id, "tag_id": resolved[name].id}
+        for note_id, names in names_by_note.items()
+        for name in dict.fromkeys(names)
+    ]
+    if rows:
+        db.execute(insert(note_tags).values(rows))
+
+
+def _attach_notes(db: Session, results: List[BatchResult]) -> None:
+    # Load the final state of every note that still exists, in one query
+    ids = {r.note_id for r in results if r.note_id is not None and r.status in (200, 201)}
+    if not ids:
+        return
+    notes = {
+        note.id: note for note in db.query(Notes)
+        .options(selectinload(Notes.tags))
+        .populate_existing()
+        .filter(Notes.id.in_(ids))
+    }
+    for result in results:
+        note: Optional[Notes] = notes.get(result.note_id) if result.status in (200, 201) else None
+        if note is not None:
+            result.note = ResponseNote.model_validate(note)
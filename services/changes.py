@@ -0,0 +1,62 @@
+import hashlib
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from models.change_sequence import ChangeSequence
+from models.note import SharedNote
+from services.response_cache import CHANGED_SCOPES
+
+# Change sequences behind the list ETags: a listing cannot have changed
+# while the sequence of its scope stays the same. Bumps run in the caller's
+# transaction, so they commit or roll back with the write itself.
+GLOBAL_SCOPE = "notes"
+
+
+def user_scope(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def _bump(db: Session, scopes: set) -> None:
+    if not scopes:
+        return
+    # Cached pages of these scopes are dropped once the transaction commits
+    db.info.setdefault(CHANGED_SCOPES, set()).update(scopes)
+    stmt = insert(ChangeSequence).values([{"scope": scope, "seq": 1} for scope in sorted(scopes)])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["scope"], set_={"seq": ChangeSequence.seq + 1}
+    ))
+
+
+def notes_changed(db: Session, changes: Iterable[Tuple[int, int]]) -> None:
+    # Notes (note_id, owner_id) were created, edited or deleted: bump the
+    # global listing, the owners and everyone the notes are shared with.
+    # Call before the shared_notes rows of deleted notes go away.
+    changes = list(changes)
+    if not changes:
+        return
+    recipients = db.scalars(
+        select(SharedNote.user_id).where(SharedNote.note_id.in_([note_id for note_id, _ in changes])).distinct()
+    )
+    _bump(db, {GLOBAL_SCOPE}
+        | {user_scope(owner_id) for _, owner_id in changes}
+        | {user_scope(user_id) for user_id in recipients})
+
+
+def note_shared(db: Session, recipient_id: int) -> None:
+    _bump(db, {user_scope(recipient_id)})
+
+
+def sequences(db: Session, scopes: List[str]) -> Dict[str, int]:
+    found = dict(db.execute(
+        select(ChangeSequence.scope, ChangeSequence.seq).where(ChangeSequence.scope.in_(scopes))
+    ).all())
+    return {scope: found.get(scope, 0) for scope in scopes}
+
+
+def list_etag(db: Session, scope: str, user_id: int, path: str, query: str) -> str:
+    # Strong ETag of one listing: its scope's sequence, the caller, the path
+    # (/mine and /pinned share a scope) and the normalized query string
+    seq = sequences(db, [scope])[scope]
+    digest = hashlib.sha256(f"{scope}:{seq}:{user_id}:{path}?{query}".encode()).hexdigest()[:32]
+    return f'"{digest}"'
@@ -0,0 +1,109 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import case, func, literal, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from models.note import Notes, SharedNote
+from models.note_counter import NoteCounter
+
+# Per-owner note totals served in O(1) to the list endpoints.
+# Deltas are applied in the caller's transaction; an owner without a row yet
+# is skipped on writes and counted from scratch, atomically, on the first read.
+
+def snapshot(note: Notes) -> dict:
+    # Flags that decide which counters a note contributes to
+    return {"archived": bool(note.archived), "pinned": bool(note.pinned), "favorite": bool(note.favorite)}
+
+
+def _contribution(state: Optional[dict]) -> dict:
+    if state is None:
+        return {}
+    if state["archived"]:
+        return {"archived": 1}
+    return {"active": 1, "pinned": int(state["pinned"]), "favorite": int(state["favorite"])}
+
+
+def _apply(db: Session, condition, delta: dict) -> None:
+    values = {name: getattr(NoteCounter, name) + amount for name, amount in delta.items() if amount}
+    if values:
+        db.execute(
+            update(NoteCounter).where(condition).values(values)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def note_changed(db: Session, note_id: int, owner_id: int, before: Optional[dict], after: Optional[dict]) -> None:
+    # Move the owner's counters from the `before` state to `after`
+    # (None meaning the note does not exist), and keep the recipients'
+    # shared_with_me in step when the note enters or leaves the active set.
+    notes_changed(db, [(note_id, owner_id, before, after)])
+
+
+def notes_changed(db: Session, changes: List[Tuple[int, int, Optional[dict], Optional[dict]]]) -> None:
+    # Set-based version of note_changed for many (note_id, owner_id, before, after)
+    owner_deltas: Dict[int, Dict[str, int]] = {}
+    entering, leaving = [], []
+    for note_id, owner_id, before, after in changes:
+        old, new = _contribution(before), _contribution(after)
+        delta = owner_deltas.setdefault(owner_id, {})
+        for name in set(old) | set(new):
+            delta[name] = delta.get(name, 0) + new.get(name, 0) - old.get(name, 0)
+        active = new.get("active", 0) - old.get("active", 0)
+        if active > 0:
+            entering.append(note_id)
+        elif active < 0:
+            leaving.append(note_id)
+
+    for owner_id, delta in owner_deltas.items():
+        _apply(db, NoteCounter.owner_id == owner_id, delta)
+
+    for note_ids, sign in ((entering, 1), (leaving, -1)):
+        if not note_ids:
+            continue
+        # Each recipient moves by the number of distinct affected notes shared with them
+        per_recipient = select(func.count(func.distinct(SharedNote.note_id))).where(
+            SharedNote.user_id == NoteCounter.owner_id,
+            SharedNote.note_id.in_(note_ids)
+        ).scalar_subquery()
+        recipients = select(SharedNote.user_id).where(SharedNote.note_id.in_(note_ids))
+        db.execute(
+            update(NoteCounter).where(NoteCounter.owner_id.in_(recipients))
+            .values(shared_with_me=NoteCounter.shared_with_me + sign * per_recipient)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def note_shared(db: Session, note: Notes, recipient_id: int) -> None:
+    if not note.archived:
+        _apply(db, NoteCounter.owner_id == recipient_id, {"shared_with_me": 1})
+
+
+def rebuild(db: Session, owner_id: int) -> NoteCounter:
+    # Count everything and store it in one INSERT ... SELECT; used the first
+    # time an owner is read. Writers skip owners without a row, so counting
+    # in a separate statement would lose the notes written in between.
+    active = Notes.archived == False
+    shared = select(func.count(func.distinct(SharedNote.note_id))).join(
+        Notes, Notes.id == SharedNote.note_id
+    ).where(SharedNote.user_id == owner_id, active).correlate(None).scalar_subquery()
+    counts = select(
+        literal(owner_id),
+        func.count(case((active, 1))),
+        func.count(case((active & (Notes.pinned == True), 1))),
+        func.count(case((active & (Notes.favorite == True), 1))),
+        func.count(case((Notes.archived == True, 1))),
+        shared,
+    ).where(Notes.owner_id == owner_id)
+    db.execute(
+        insert(NoteCounter)
+        .from_select(["owner_id", "active", "pinned", "favorite", "archived", "shared_with_me"], counts)
+        .on_conflict_do_nothing(index_elements=["owner_id"])
+    )
+    db.commit()
+    return db.get(NoteCounter, owner_id)
+
+
+def get_counters(db: Session, owner_id: int) -> NoteCounter:
+    counters = db.get(NoteCounter, owner_id, populate_existing=True)
+    if counters is None:
+        counters = rebuild(db, owner_id)
+    return counters
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload, undefer
+from database import AsyncSessionLocal
+from models.note import Notes, SharedNote
+
+# Rows fetched and serialized per round trip; memory stays bounded by one
+# batch whatever the number of notes
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "notes.ndjson"),
+    "csv": ("text/csv", "notes.csv"),
+}
+CSV_COLUMNS = ["id", "title", "content", "important", "archived", "pinned", "favorite", "tags", "shared_with"]
+
+
+def export_record(note: Notes) -> dict:
+    return {
+        "id": note.id,
+        "title": note.title,
+        "content": note.content,
+        "important": bool(note.important),
+        "archived": bool(note.archived),
+        "pinned": bool(note.pinned),
+        "favorite": bool(note.favorite),
+        "updated_at": note.updated_at.isoformat() if note.updated_at else None,
+        "tags": [tag.name for tag in note.tags],
+        "shared_with": [
+            {"username": share.user.username, "can_edit": bool(share.can_edit)}
+            for share in note.shared_with
+        ],
+    }
+
+
+def _csv_line(values: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def _csv_record(record: dict) -> str:
+    # Tags and shares are comma-separated inside their cell, shares as
+    # username:edit or username:read
+    return _csv_line([
+        *(record[column] for column in CSV_COLUMNS[:-2]),
+        ",".join(record["tags"]),
+        ",".join(f"{share['username']}:{'edit' if share['can_edit'] else 'read'}" for share in record["shared_with"]),
+    ])
+
+
+async def stream_export(owner_id: int, fmt: str = "ndjson", archived: Optional[bool] = None) -> AsyncIterator[str]:
+    # Runs while the response is being sent, after the request's own session
+    # is gone, so it opens its own. Notes are read in id order EXPORT_BATCH_SIZE
+    # at a time (keyset, so each batch is an index range), with the batch's
+    # tags and shares loaded in one query each.
+    query = (
+        select(Notes)
+        .where(Notes.owner_id == owner_id)
+        .options(
+            undefer(Notes.content_blob),
+            selectinload(Notes.tags),
+            selectinload(Notes.shared_with).selectinload(SharedNote.user),
+        )
+        .order_by(Notes.id)
+    )
+    if archived is not None:
+        query = query.where(Notes.archived == archived)
+
+    if fmt == "csv":
+        yield _csv_line(CSV_COLUMNS)
+    async with AsyncSessionLocal() as db:
+        last_id = 0
+        while True:
+            notes = (await db.scalars(query.where(Notes.id > last_id).limit(EXPORT_BATCH_SIZE))).all()
+            if not notes:
+                return
+            records = [export_record(note) for note in notes]
+            last_id = notes[-1].id
+            db.expunge_all()
+            if fmt == "csv":
+                yield "".join(_csv_record(record) for record in records)
+            else:
+                yield "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
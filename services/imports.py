@@ -0,0 +1,197 @@
+import csv
+import json
+from typing import AsyncIterator, List, Tuple, Union
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models.note import Notes
+from schemas.imports import ImportLineError, ImportReport
+from schemas.note import CreateNote
+from services import counters
+from services import changes as list_changes
+from services.batch_service import insert_notes
+
+# Bulk import of NDJSON or CSV uploads (the formats services/export.py
+# writes). The body is read as it arrives and inserted IMPORT_BATCH_SIZE
+# records per transaction, so memory stays bounded by one batch.
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_BATCH_SIZE = 10000
+MAX_REPORTED_ERRORS = 1000
+CSV_FLAGS = ("important", "archived", "pinned", "favorite")
+DUPLICATE_TITLE = "Note with this title already exists"
+
+Record = Tuple[int, Union[dict, str]]
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    # (line number, raw line) as the chunks come in. Splitting on b"\n" is
+    # safe in UTF-8, and decoding per line turns bad bytes into a line error.
+    pending = b""
+    number = 0
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, line
+    if pending:
+        yield number + 1, pending
+
+
+def _decode(line: bytes, number: int) -> str:
+    if number == 1 and line.startswith(b"\xef\xbb\xbf"):
+        line = line[3:]
+    return line.decode("utf-8")
+
+
+async def _ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    async for number, line in _lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(_decode(line, number))
+        except UnicodeDecodeError:
+            yield number, "Line is not valid UTF-8"
+            continue
+        except ValueError as e:
+            yield number, f"Invalid JSON: {e}"
+            continue
+        yield number, record if isinstance(record, dict) else "Expected a JSON object"
+
+
+def _csv_values(raw: bytes, number: int) -> List[str]:
+    return next(csv.reader([_decode(raw, number).rstrip("\r")]))
+
+
+def _csv_record(header: List[str], values: List[str]) -> Union[dict, str]:
+    if len(values) != len(header):
+        return f"Expected {len(header)} columns, got {len(values)}"
+    record = dict(zip(header, values))
+    # Empty flags take the default; tags are comma-separated in their cell
+    for flag in CSV_FLAGS:
+        if record.get(flag) == "":
+            del record[flag]
+    if "tags" in record:
+        record["tags"] = [name.strip() for name in record["tags"].split(",") if name.strip()]
+    return record
+
+
+async def _csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    # The first record is the header. A quoted field may span lines: a record
+    # is complete once its quotes are balanced.
+    header = None
+    start, raw = 0, b""
+    async for number, line in _lines(chunks):
+        if not raw:
+            if not line.strip():
+                continue
+            start, raw = number, line
+        else:
+            raw += b"\n" + line
+        if raw.count(b'"') % 2:
+            continue
+        record, raw = raw, b""
+        try:
+            values = _csv_values(record, start)
+        except UnicodeDecodeError:
+            yield start, "Line is not valid UTF-8"
+            continue
+        except csv.Error as e:
+            yield start, f"Invalid CSV: {e}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield start, _csv_record(header, values)
+    if raw:
+        yield start, "Unterminated quoted field"
+
+
+def _validation_detail(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'record'}: {e['msg']}" for e in error.errors()
+    )
+
+
+def import_batch(db: Session, rows: List[Tuple[int, CreateNote]], owner_id: int) -> Tuple[int, List[ImportLineError]]:
+    # Insert one batch in one transaction: the same title and word checks as
+    # POST /notes/, the owner's existing titles looked up in one indexed
+    # query, then bulk INSERTs for the notes, their tags and their search rows.
+    errors = []
+    taken = {row.title for row in db.query(Notes.title).filter(
+        Notes.owner_id == owner_id,
+        Notes.title.in_({note.title for _, note in rows})
+    )}
+    accepted = []
+    for line, note in rows:
+        if "forbidden" in note.title.lower():
+            errors.append(ImportLineError(line=line, detail="Title contains forbidden word"))
+        elif note.title in taken:
+            errors.append(ImportLineError(line=line, detail=DUPLICATE_TITLE))
+        else:
+            taken.add(note.title)
+            accepted.append((line, note))
+
+    try:
+        ids = _store(db, [note for _, note in accepted], owner_id)
+    except IntegrityError:
+        # A title taken since the lookup (a concurrent write): roll back this
+        # batch only and store its notes one by one, so just the duplicates fail
+        db.rollback()
+        ids = []
+        for line, note in accepted:
+            try:
+                ids += _store(db, [note], owner_id)
+            except IntegrityError:
+                db.rollback()
+                errors.append(ImportLineError(line=line, detail=DUPLICATE_TITLE))
+    return len(ids), errors
+
+
+def _store(db: Session, notes: List[CreateNote], owner_id: int) -> List[int]:
+    ids = insert_notes(db, notes, owner_id)
+    counters.notes_changed(db, [
+        (note_id, owner_id, None, counters.snapshot(note)) for note_id, note in zip(ids, notes)
+    ])
+    list_changes.notes_changed(db, [(note_id, owner_id) for note_id in ids])
+    db.commit()
+    return ids
+
+
+async def import_notes(
+    db: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    owner_id: int,
+    fmt: str = "ndjson",
+    batch_size: int = IMPORT_BATCH_SIZE
+) -> ImportReport:
+    report = ImportReport(imported=0, failed=0, errors=[])
+
+    def fail(errors: List[ImportLineError]) -> None:
+        report.failed += len(errors)
+        report.errors.extend(errors[:MAX_REPORTED_ERRORS - len(report.errors)])
+
+    async def flush(rows) -> None:
+        if rows:
+            imported, errors = await db.run_sync(import_batch, rows, owner_id)
+            report.imported += imported
+            fail(errors)
+
+    records = _csv_records(chunks) if fmt == "csv" else _ndjson_records(chunks)
+    batch = []
+    async for line, record in records:
+        if isinstance(record, str):
+            fail([ImportLineError(line=line, detail=record)])
+            continue
+        try:
+            batch.append((line, CreateNote.model_validate(record)))
+        except ValidationError as e:
+            fail([ImportLineError(line=line, detail=_validation_detail(e))])
+            continue
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    await flush(batch)
+    report.errors.sort(key=lambda error: error.line)
+    return report
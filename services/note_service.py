@@ -1,69 +1,323 @@
-from typing import Optional
+from contextlib import contextmanager
+from typing import List, Optional, Sequence, Tuple, Union
 from fastapi import HTTPException
-from sqlalchemy import or_
-from schemas.note import CreateNote, UpdatedNote, ResponseNote, PaginatedNotes
+from sqlalchemy import and_, false, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from schemas.note import (
+    CreateNote, UpdatedNote, ResponseNote, PaginatedNotes, SearchNote, SearchResults,
+    SparseNote, SparseNotes, NOTE_FIELDS, NOTE_VIEWS
+)
 from models.note import Notes, SharedNote
-from models.user import User
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only, selectinload, undefer
 from models.tag import Tag
+from models.note_tags import note_tags
+from schemas.tag import TagCount, TagFacets
+from services import search, pagination, counters, tags, changes
+
+def content_fields(content: str) -> dict:
+    # Stored columns of a body (compressed when large, see
+    # models/compression.py) with its excerpt and length, for the bulk
+    # INSERTs and UPDATEs that bypass the Notes.content setter
+    return Notes.stored_content(content)
+
+def _columns(name: str) -> list:
+    # Mapped columns behind a note field; the body spans three
+    if name == "content":
+        return [Notes._content, Notes.content_codec, Notes.content_blob]
+    return [getattr(Notes, name)]
+
+def parse_fields(fields: Optional[str] = None, view: Optional[str] = None) -> Optional[List[str]]:
+    # fields=title,pinned or view=summary|preview -> the note fields to
+    # return, None for the full note. id is always included.
+    if fields is None:
+        return list(NOTE_VIEWS[view]) if view in NOTE_VIEWS else None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(NOTE_FIELDS))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Invalid fields: {', '.join(unknown)}")
+    return ["id"] + [name for name in NOTE_FIELDS if name in names and name != "id"]
+
+def notes_query(db: Session, fields: Optional[List[str]] = None, keys: Sequence[pagination.SortKey] = ()):
+    # Base query of every note listing: the tags of a whole page come
+    # in one extra SELECT ... IN instead of a lazy load per note, and
+    # compressed bodies with the rows instead of a deferred load each.
+    # With `fields` only those columns are read, plus the sort keys the
+    # next cursor is built from.
+    query = db.query(Notes)
+    if fields is None:
+        return query.options(selectinload(Notes.tags), undefer(Notes.content_blob))
+    names = dict.fromkeys([name for name in fields if name != "tags"] + [name for name, _ in keys])
+    query = query.options(load_only(*(column for name in names for column in _columns(name))))
+    if "tags" in fields:
+        query = query.options(selectinload(Notes.tags))
+    return query
+
+def serialize_note(note: Notes, fields: Optional[List[str]] = None, **extra):
+    # `extra` holds the search snippet, which only search results carry
+    if fields is None:
+        return (SearchNote if extra else ResponseNote).model_validate(note).model_copy(update=extra)
+    return SparseNote(**{name: getattr(note, name) for name in fields}, **extra)
+
+def _page(rows, total, limit, offset, cursor, next_cursor, fields, search=False) -> Union[PaginatedNotes, SparseNotes]:
+    page = SearchResults if search else PaginatedNotes
+    if fields is not None:
+        page = SparseNotes
+        rows = [row if isinstance(row, SparseNote) else serialize_note(row, fields) for row in rows]
+    return page(
+        total=total,
+        limit=limit,
+        offset=0 if cursor is not None else offset,
+        data=rows,
+        next_cursor=next_cursor
+    )
+
+def _tag_filter(db: Session, names: List[str], mode: str = "all"):
+    # Condition on Notes.id for notes having all, any or none of the tags.
+    # The names are resolved to ids once; each mode is one semi-join on
+    # note_tags, so a note is never repeated whatever its number of tags.
+    names = list(dict.fromkeys(name for name in names if name))
+    if not names:
+        return None
+    ids = list(db.scalars(select(Tag.id).where(Tag.name.in_(names))))
+    tagged = select(note_tags.c.note_id).where(note_tags.c.tag_id.in_(ids))
+    if mode == "none":
+        return ~Notes.id.in_(tagged) if ids else None
+    if mode == "any":
+        return Notes.id.in_(tagged) if ids else false()
+    # all: an unknown tag matches nothing
+    if len(ids) < len(names):
+        return false()
+    return Notes.id.in_(
+        tagged.group_by(note_tags.c.note_id).having(func.count(note_tags.c.tag_id) == len(ids))
+    )
+
+def _filter_notes(
+    db: Session,
+    query,
+    q: Optional[str] = None,
+    tag: Optional[List[str]] = None,
+    favorite: Optional[bool] = None,
+    pinned: Optional[bool] = None,
+    tag_mode: str = "all"
+):
+    # Filters common to the listings. Returns the query and the FTS match
+    # subquery, which adds a snippet column (None without q or without FTS).
+    tagged = _tag_filter(db, tag, tag_mode) if tag else None
+    if tagged is not None:
+        query = query.filter(tagged)
+
+    # Full-text search through the FTS5 index, LIKE scan when unavailable
+    matches = search.match_subquery(db, q) if q else None
+    if matches is not None:
+        query = query.join(matches, Notes.id == matches.c.rowid).add_columns(matches.c.snippet)
+    elif q:
+        query = query.filter(
+            or_(
+                Notes.title.ilike(f"%{q}%"),
+                Notes.content.ilike(f"%{q}%"),
+                # Compressed bodies are only matched on their excerpt
+                Notes.preview.ilike(f"%{q}%")
+            )
+        )
+    if favorite is not None:
+        query = query.filter(Notes.favorite == favorite)
+
+    if pinned is not None:
+        query = query.filter(Notes.pinned == pinned)
+    return query, matches
+
+def _with_snippets(rows, matches, fields):
+    if matches is None:
+        return rows
+    return [serialize_note(note, fields, snippet=snippet) for note, snippet in rows]
 
 def list_notes_paginated(
     db: Session,
     q: Optional[str] = None,
-    tag: Optional[str] = None,
+    tag: Optional[List[str]] = None,
+    tag_mode: str = "all",
     favorite: Optional[bool] = None,
     pinned: Optional[bool] = None,
     show_archived: bool = False,
     limit: int = 10,
     offset: int = 0,
     order_by: str = "id",
-    order: str = "asc"
-) -> PaginatedNotes:
-    base_query = db.query(Notes)
+    order: str = "asc",
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[List[str]] = None
+) -> Union[PaginatedNotes, SparseNotes]:
+    # Validate order_by field
+    if order_by not in pagination.SORT_COLUMNS:
+        raise HTTPException(status_code=422, detail="Invalid order_by field")
+    keys = pagination.sort_keys_for(order_by, order.lower() == "desc")
+
+    base_query = notes_query(db, fields, keys)
 
     if not show_archived:
         base_query = base_query.filter(Notes.archived == False)
-    column = getattr(Notes, order_by)
-    base_query = base_query.order_by(
-        Notes.pinned.desc(), 
-        column.desc() if order == "desc" else column.asc())
-    if tag:
-        base_query = base_query.join(Notes.tags).filter(Tag.name == tag)
-    if q: 
-        base_query = base_query.filter(
-            or_(
-                Notes.title.ilike(f"%{q}%"),
-                Notes.content.ilike(f"%{q}%")
-            )
+    base_query, matches = _filter_notes(db, base_query, q, tag, favorite, pinned, tag_mode)
+
+    if sort == "relevance" and matches is not None:
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="Cursor pagination is not supported with sort=relevance")
+        # bm25() is lower for better matches
+        base_query = base_query.order_by(matches.c.rank, Notes.id)
+        total = pagination.count_rows(base_query) if include_total else None
+        result = base_query.offset(offset).limit(limit).all()
+        next_cursor = None
+    else:
+        result, total, next_cursor = pagination.paginate(
+            base_query, keys, limit, offset, cursor, count=include_total
         )
-    if favorite is not None:
-        base_query = base_query.filter(Notes.favorite == favorite)
 
+    return _page(
+        _with_snippets(result, matches, fields), total, limit, offset, cursor, next_cursor, fields, search=bool(q)
+    )
+
+def list_owned_notes(
+    db: Session,
+    owner_id: int,
+    pinned: Optional[bool] = None,
+    favorite: Optional[bool] = None,
+    archived: bool = False,
+    limit: int = 10,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[List[str]] = None
+) -> Union[PaginatedNotes, SparseNotes]:
+    # Notes of one owner, newest first (pinned first unless filtered on)
+    keys = [("pinned", True), ("id", True)]
+    if pinned is not None or favorite is not None:
+        keys = [("id", True)]
+    query = notes_query(db, fields, keys).filter(
+        Notes.owner_id == owner_id,
+        Notes.archived == archived
+    )
     if pinned is not None:
-        base_query = base_query.filter(Notes.pinned == pinned)
-    # Validate order_by field
-    if not hasattr(Notes, order_by):
-        order_by = "id"
-    column = getattr(Notes, order_by)
-    if order.lower() == "desc":
-        column = column.desc()
-    else:
-        column = column.asc()
+        query = query.filter(Notes.pinned == pinned)
+    if favorite is not None:
+        query = query.filter(Notes.favorite == favorite)
 
-    base_query = base_query.order_by(column)
-    total = base_query.count()
-    result = base_query.offset(offset).limit(limit).all()
-    valid_fields = {"id", "title", "content", "important"}
-    if order_by not in valid_fields:
-        raise HTTPException(status_code=422, detail="Invalid order_by field")
+    # Serve the total from the owner's counters when the filters match one
+    counter = None
+    if archived:
+        counter = "archived" if pinned is None and favorite is None else None
+    elif pinned is None and favorite is None:
+        counter = "active"
+    elif pinned is True and favorite is None:
+        counter = "pinned"
+    elif favorite is True and pinned is None:
+        counter = "favorite"
+
+    notes, total, next_cursor = pagination.paginate(
+        query, keys, limit, offset, cursor, count=include_total and counter is None
+    )
+    if include_total and counter is not None:
+        total = getattr(counters.get_counters(db, owner_id), counter)
+    return _page(notes, total, limit, offset, cursor, next_cursor, fields)
+
+def list_shared_notes(
+    db: Session,
+    user_id: int,
+    q: Optional[str] = None,
+    tag: Optional[List[str]] = None,
+    tag_mode: str = "all",
+    favorite: Optional[bool] = None,
+    archived: bool = False,
+    limit: int = 10,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[List[str]] = None
+) -> Union[PaginatedNotes, SparseNotes]:
+    # Notes other users shared with `user_id`: a join on the recipient's
+    # share rows (ix_shared_notes_user_note), at most one per note
+    keys = [("pinned", True), ("id", True)]
+    query = notes_query(db, fields, keys).join(
+        SharedNote, and_(SharedNote.note_id == Notes.id, SharedNote.user_id == user_id)
+    ).filter(Notes.archived == archived)
+    query, matches = _filter_notes(db, query, q, tag, favorite, tag_mode=tag_mode)
+
+    # The unfiltered total is the recipient's shared_with_me counter
+    counted = not (archived or q or tag or favorite is not None)
+    notes, total, next_cursor = pagination.paginate(
+        query, keys, limit, offset, cursor, count=include_total and not counted
+    )
+    if include_total and counted:
+        total = counters.get_counters(db, user_id).shared_with_me
+    return _page(
+        _with_snippets(notes, matches, fields), total, limit, offset, cursor, next_cursor, fields, search=bool(q)
+    )
+
+def list_visible_notes(
+    db: Session,
+    user_id: int,
+    q: Optional[str] = None,
+    tag: Optional[List[str]] = None,
+    tag_mode: str = "all",
+    favorite: Optional[bool] = None,
+    archived: bool = False,
+    limit: int = 10,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[List[str]] = None
+) -> Union[PaginatedNotes, SparseNotes]:
+    # Everything `user_id` can read, owned or shared, as one query and one
+    # ordering, so pages and cursors span both sets
+    keys = [("pinned", True), ("id", True)]
+    query = notes_query(db, fields, keys).filter(
+        or_(
+            Notes.owner_id == user_id,
+            Notes.id.in_(select(SharedNote.note_id).where(SharedNote.user_id == user_id))
+        ),
+        Notes.archived == archived
+    )
+    query, matches = _filter_notes(db, query, q, tag, favorite, tag_mode=tag_mode)
 
-    return PaginatedNotes(
-        total = total,
-        limit = limit,
-        offset = offset,
-        data = result
+    notes, total, next_cursor = pagination.paginate(query, keys, limit, offset, cursor, count=include_total)
+    return _page(
+        _with_snippets(notes, matches, fields), total, limit, offset, cursor, next_cursor, fields, search=bool(q)
     )
 
+def tag_facets(
+    db: Session,
+    user_id: int,
+    q: Optional[str] = None,
+    tag: Optional[List[str]] = None,
+    tag_mode: str = "all",
+    favorite: Optional[bool] = None,
+    pinned: Optional[bool] = None,
+    archived: bool = False
+) -> TagFacets:
+    # Tags of the user's notes matching the filters, with their note counts,
+    # most used first: one GROUP BY over note_tags for the selected notes
+    notes = db.query(Notes).filter(Notes.owner_id == user_id, Notes.archived == archived)
+    notes, _ = _filter_notes(db, notes, q, tag, favorite, pinned, tag_mode)
+    count = func.count(note_tags.c.note_id)
+    rows = (
+        db.query(Tag.id, Tag.name, count)
+        .join(note_tags, note_tags.c.tag_id == Tag.id)
+        .filter(note_tags.c.note_id.in_(notes.with_entities(Notes.id)))
+        .group_by(Tag.id, Tag.name)
+        .order_by(count.desc(), Tag.name)
+        .all()
+    )
+    return TagFacets(data=[TagCount(id=tag_id, name=name, count=total) for tag_id, name, total in rows])
+
+@contextmanager
+def title_conflict(db: Session):
+    # Titles are unique per owner (uq_notes_owner_title): a duplicate is
+    # rejected by the write inside this block and becomes a 409
+    try:
+        yield
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Note with this title already exists")
+
 def create_note(
     db: Session, 
     note: CreateNote,
@@ -72,28 +326,20 @@ def create_note(
     # Create a new Note instance with the provided data
     new_note = Notes(
         title=note.title,
-        content=note.content,
+        **content_fields(note.content),
         important=note.important,
         archived=note.archived,
         owner_id=owner_id,
         pinned=note.pinned,
         favorite=note.favorite
     )
-    # Create Tags
-    tag_objects = []
-    for tag_name in note.tags:
-        tag = db.query(Tag).filter_by(name=tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.add(tag)
-            db.commit()
-            db.refresh(tag)
-        tag_objects.append(tag)
-    
-    new_note.tags = tag_objects
-
     # Add the new note to the session and commit it to the database
     db.add(new_note)
+    with title_conflict(db):
+        db.flush()
+    tags.set_note_tags(db, new_note.id, tags.resolve_tags(db, note.tags), replace=False)
+    counters.note_changed(db, new_note.id, owner_id, None, counters.snapshot(new_note))
+    changes.notes_changed(db, [(new_note.id, owner_id)])
     db.commit()
     db.refresh(new_note)
 
@@ -103,16 +349,78 @@ def create_note(
 
 def search_note(db: Session, note_id: int) -> Optional[ResponseNote]:
     # Search for a note by its ID
-    note = db.query(Notes).filter(Notes.id == note_id).first()
+    note = notes_query(db).filter(Notes.id == note_id).first()
     if note:
         return ResponseNote.model_validate(note)
     return None
 
-def update_note(db: Session, note: Notes, updated: UpdatedNote) -> Optional[ResponseNote]:
+# Access levels of a user on a note, lowest first
+ACCESS_NONE, ACCESS_READER, ACCESS_EDITOR, ACCESS_OWNER = "none", "reader", "editor", "owner"
+ACCESS_LEVELS = (ACCESS_NONE, ACCESS_READER, ACCESS_EDITOR, ACCESS_OWNER)
+
+def resolve_access(db: Session, note_id: int, user_id: int, full: bool = False) -> Tuple[Optional[Notes], str]:
+    # The note and the user's access level in one query: the user's share
+    # row (unique per note and user) is outer-joined onto the note. `full`
+    # also loads the body and tags, for routes that return the note.
+    query = (
+        select(Notes, SharedNote.can_edit)
+        .outerjoin(SharedNote, and_(SharedNote.note_id == Notes.id, SharedNote.user_id == user_id))
+        .where(Notes.id == note_id)
+    )
+    if full:
+        query = query.options(selectinload(Notes.tags), undefer(Notes.content_blob))
+    row = db.execute(query).first()
+    if row is None:
+        return None, ACCESS_NONE
+    note, can_edit = row
+    if note.owner_id == user_id:
+        return note, ACCESS_OWNER
+    if can_edit is None:
+        return note, ACCESS_NONE
+    return note, ACCESS_EDITOR if can_edit else ACCESS_READER
+
+def authorize_note(db: Session, note_id: int, user_id: int, required: str, detail: str, full: bool = False) -> Notes:
+    # The note if the user has at least `required` access: 404 when it does
+    # not exist, 403 with `detail` otherwise
+    note, access = resolve_access(db, note_id, user_id, full)
+    if note is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    if ACCESS_LEVELS.index(access) < ACCESS_LEVELS.index(required):
+        raise HTTPException(status_code=403, detail=detail)
+    return note
+
+def version_etag(note_id: int, version: int) -> str:
+    return f'"{note_id}-{version}"'
+
+def note_etag(db: Session, note_id: int, user_id: int) -> Optional[str]:
+    # Strong ETag of a note the user may read, from one indexed lookup;
+    # None when it does not exist or is not readable
+    version = db.scalar(
+        select(Notes.version).where(
+            Notes.id == note_id,
+            or_(
+                Notes.owner_id == user_id,
+                Notes.id.in_(select(SharedNote.note_id).where(SharedNote.user_id == user_id))
+            )
+        )
+    )
+    return None if version is None else version_etag(note_id, version)
+
+def list_scope(user_id: int, global_scope: bool = False) -> str:
+    # GET /notes/ lists every note; the other listings only depend on
+    # the user's own notes and the ones shared with them
+    return changes.GLOBAL_SCOPE if global_scope else changes.user_scope(user_id)
+
+def list_etag(db: Session, user_id: int, path: str, query: str, global_scope: bool = False) -> str:
+    return changes.list_etag(db, list_scope(user_id, global_scope), user_id, path, query)
+
+def apply_update(db: Session, note: Notes, updated: UpdatedNote, include_tags: bool = True) -> None:
+    # Copy the provided fields onto the note (no commit)
     if updated.title is not None:
         note.title = updated.title
     if updated.content is not None:
-        note.content = updated.content
+        for field, value in content_fields(updated.content).items():
+            setattr(note, field, value)
     if updated.important is not None:
         note.important = updated.important
     if updated.archived is not None:
@@ -121,86 +429,60 @@ def update_note(db: Session, note: Notes, updated: UpdatedNote) -> Optional[Resp
         note.pinned = updated.pinned
     if updated.favorite is not None:
         note.favorite = updated.favorite
-        
+
     # Update Tags, if have
-    if updated.tags is not None:
-        updated_tags = []
-        for tag_name in updated.tags:
-            tag = db.query(Tag).filter_by(name=tag_name).first()
-            if not tag:
-                tag = Tag(name=tag_name)
-                db.add(tag)
-                db.commit()
-                db.refresh(tag)
-            updated_tags.append(tag)
-        note.tags = updated_tags
+    if include_tags and updated.tags is not None:
+        tags.set_note_tags(db, note.id, tags.resolve_tags(db, updated.tags))
+    note.version = Notes.version + 1
 
+def update_note(db: Session, note: Notes, updated: UpdatedNote) -> Optional[ResponseNote]:
+    before = counters.snapshot(note)
+    with title_conflict(db):
+        apply_update(db, note, updated)
+        db.flush()
+
+    counters.note_changed(db, note.id, note.owner_id, before, counters.snapshot(note))
+    changes.notes_changed(db, [(note.id, note.owner_id)])
     db.commit()
     db.refresh(note)
     return ResponseNote.model_validate(note)
 
-def patch_note(db: Session, note_id: int, updated: UpdatedNote) -> Optional[ResponseNote]:
-    # Update only fields that are provided 
-    note = db.query(Notes).filter(Notes.id == note_id).first()
-    if not note:
-        return None
+def patch_note(db: Session, note: Notes, updated: UpdatedNote) -> ResponseNote:
+    # Update only fields that are provided (unset ones are None)
+    return update_note(db, note, updated)
 
-    if updated.title is not None:
-        note.title = updated.title
-    if updated.content is not None:
-        note.content = updated.content
-    if updated.important is not None:
-        note.important = updated.important
-    if updated.pinned is not None:
-        note.pinned = updated.pinned
-    if updated.archived is not None:
-        note.archived = updated.archived
-    if updated.favorite is not None:
-        note.favorite = updated.favorite
-
-    if updated.tags is not None:
-        new_tags = []
-        for tag_name in updated.tags:
-            tag = db.query(Tag).filter_by(name=tag_name).first()
-            if not tag:
-                tag = Tag(name=tag_name)
-                db.add(tag)
-                db.commit()
-                db.refresh(tag)
-            new_tags.append(tag)
-        note.tags = new_tags
+def delete_note(db: Session, note: Notes) -> None:
+    # Counters first: the recipients are found through shared_notes,
+    # whose rows go away with the note
+    counters.note_changed(db, note.id, note.owner_id, counters.snapshot(note), None)
+    changes.notes_changed(db, [(note.id, note.owner_id)])
+    db.delete(note)
+    db.commit()
 
+def set_flag(db: Session, note: Notes, field: str, value: bool) -> ResponseNote:
+    # Pin/favorite/archive toggles
+    before = counters.snapshot(note)
+    setattr(note, field, value)
+    note.version = Notes.version + 1
+    counters.note_changed(db, note.id, note.owner_id, before, counters.snapshot(note))
+    changes.notes_changed(db, [(note.id, note.owner_id)])
     db.commit()
     db.refresh(note)
     return ResponseNote.model_validate(note)
 
-def delete_note(db: Session, note_id: int) -> bool:
-    # Delete a note by its ID
-    note = db.query(Notes).filter(Notes.id == note_id).first()
-    if not note:
-        return False
-
-    db.delete(note)
-    db.commit()
-    return True
-
-def share_note(db: Session, note_id: int, target_user_id: int, can_edit: bool) -> bool:
-    # Check if note exists
-    note = db.query(Notes).filter(Notes.id == note_id).first()
-    if not note:
-        return False
-
-    # Check if target user exists
-    user = db.query(User).filter(User.id == target_user_id).first()
-    if not user:
-        return False
-
-    # Create shared note entry
-    shared = SharedNote(
-        note_id=note_id,
-        user_id=target_user_id,
-        can_edit=can_edit
-    )
-    db.add(shared)
+def share_note(db: Session, note: Notes, target_user_id: int, can_edit: bool) -> None:
+    # The route has resolved the note and the recipient.
+    # Sharing again only updates the permission
+    shared = db.query(SharedNote).filter_by(note_id=note.id, user_id=target_user_id).first()
+    if shared:
+        shared.can_edit = can_edit
+    else:
+        shared = SharedNote(
+            note_id=note.id,
+            user_id=target_user_id,
+            can_edit=can_edit
+        )
+        db.add(shared)
+        counters.note_shared(db, note, target_user_id)
+        changes.note_shared(db, target_user_id)
     db.commit()
-    return True
\ No newline at end of file
@@ -0,0 +1,98 @@
+import base64
+import binascii
+import json
+from typing import List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from sqlalchemy import and_, literal, or_
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Query
+from models.note import Notes
+
+# A sort key is (Notes attribute name, descending?). The last key must be
+# unique (normally "id") so every row has a distinct position.
+SortKey = Tuple[str, bool]
+
+# order_by values and the stored column each one sorts on. A cursor
+# carries the values of its sort columns, so only short columns belong
+# here. The body sorts on its preview: it is bounded, and unlike the inline
+# "content" column it is also set for compressed notes, so the cursor is
+# built from the same value the SQL seeks on.
+SORT_COLUMNS = {"id": "id", "title": "title", "content": "preview", "important": "important"}
+
+
+def sort_keys_for(order_by: str, descending: bool) -> List[SortKey]:
+    # Pinned notes first, then the requested column, with id as tie-breaker
+    keys = [("pinned", True)]
+    if order_by != "id":
+        keys.append((SORT_COLUMNS[order_by], descending))
+    keys.append(("id", descending))
+    return keys
+
+
+def encode_cursor(keys: Sequence[SortKey], values: list) -> str:
+    payload = {"k": [f"{name}:{'d' if desc else 'a'}" for name, desc in keys], "v": values}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[SortKey]) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        expected = [f"{name}:{'d' if desc else 'a'}" for name, desc in keys]
+        if payload["k"] != expected or len(payload["v"]) != len(keys):
+            raise ValueError
+        return payload["v"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _order_clauses(keys: Sequence[SortKey]):
+    return [getattr(Notes, name).desc() if desc else getattr(Notes, name).asc() for name, desc in keys]
+
+
+def _after(keys: Sequence[SortKey], values: list):
+    # Rows strictly after `values` in (k1, k2, ...) order:
+    # k1 > v1 OR (k1 = v1 AND k2 > v2) OR ...
+    columns = [getattr(Notes, name) for name, _ in keys]
+    bound = [literal(value, column.type) for value, column in zip(values, columns)]
+    clauses = []
+    for i, (_, desc) in enumerate(keys):
+        equal = [columns[j] == bound[j] for j in range(i)]
+        step = columns[i] < bound[i] if desc else columns[i] > bound[i]
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+
+def _row_note(row):
+    return row[0] if isinstance(row, Row) else row
+
+
+def count_rows(query: Query) -> int:
+    # COUNT over the ids only, so the subquery never lists the note body
+    return query.with_entities(Notes.id).order_by(None).count()
+
+
+def paginate(
+    query: Query,
+    keys: Sequence[SortKey],
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    count: bool = True
+):
+    # Returns (rows, total, next_cursor). With a cursor the page is an index
+    # seek past the last seen key; otherwise the classic OFFSET/LIMIT page.
+    # `count=False` skips the COUNT query and returns total=None.
+    total = count_rows(query) if count else None
+    if cursor is not None:
+        query = query.filter(_after(keys, decode_cursor(cursor, keys)))
+        offset = 0
+    rows = query.order_by(*_order_clauses(keys)).offset(offset).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = _row_note(rows[-1])
+        next_cursor = encode_cursor(keys, [getattr(last, name) for name, _ in keys])
+    return rows, total, next_cursor
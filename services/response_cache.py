@@ -0,0 +1,175 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+load_dotenv()
+
+# Serialized list pages, keyed by their ETag (scope, change sequence, user
+# and query string; see services/changes.py). A write bumps the sequence, so
+# an old entry can never be served again; dropping the scope's entries after
+# the commit only gives the memory back early.
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Session.info key where services/changes.py records the scopes a
+# transaction changed
+CHANGED_SCOPES = "changed_scopes"
+
+
+class ResponseCache(ABC):
+    # Backend interface. A shared backend (Redis, memcached...) implements
+    # these methods and is installed with use().
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, scope: str, value: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def invalidate(self, scopes: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class LRUResponseCache(ResponseCache):
+    # In-process LRU bounded by the total size of the stored bodies
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._scopes: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, scope: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (scope, value)
+            self._scopes.setdefault(scope, set()).add(key)
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate(self, scopes: Iterable[str]) -> None:
+        with self._lock:
+            for scope in scopes:
+                for key in self._scopes.pop(scope, ()):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        scope, value = entry
+        self._bytes -= len(value)
+        keys = self._scopes.get(scope)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._scopes[scope]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "lru",
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._scopes.clear()
+            self._bytes = 0
+
+
+class NullResponseCache(ResponseCache):
+    # RESPONSE_CACHE_MAX_BYTES=0: every lookup misses
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, scope: str, value: bytes) -> None:
+        pass
+
+    def invalidate(self, scopes: Iterable[str]) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "disabled"}
+
+    def clear(self) -> None:
+        pass
+
+
+backend: ResponseCache = (
+    LRUResponseCache(RESPONSE_CACHE_MAX_BYTES) if RESPONSE_CACHE_MAX_BYTES > 0 else NullResponseCache()
+)
+
+
+def use(cache: ResponseCache) -> None:
+    # Swap the backend, e.g. for a shared one at startup
+    global backend
+    backend = cache
+
+
+def lookup(key: str) -> Optional[bytes]:
+    return backend.get(key)
+
+
+def store(key: str, scope: str, value: bytes) -> None:
+    backend.set(key, scope, value)
+
+
+def stats() -> dict:
+    return backend.stats()
+
+
+def clear() -> None:
+    backend.clear()
+
+
+# Write-through invalidation: the scopes a transaction bumped are dropped
+# once it commits, and forgotten if it rolls back
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    scopes = session.info.pop(CHANGED_SCOPES, None)
+    if scopes:
+        backend.invalidate(scopes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session):
+    session.info.pop(CHANGED_SCOPES, None)
@@ -0,0 +1,121 @@
+import re
+from typing import Optional
+from sqlalchemy import bindparam, column, func, literal_column, select, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+# Full-text index over note titles and bodies (SQLite FTS5).
+# The index rowid is the note id, so results join straight back to `notes`.
+# It is an external-content table: only the inverted index is stored, the
+# text is read back through the `notes_search` view, which decodes
+# compressed bodies with note_text() (see database.register_sqlite_functions).
+# Triggers on `notes` keep the index in step with every write, bulk Core
+# statements and migrations included, so a connection that writes notes
+# needs note_text() registered. Snippets decode the matching bodies at
+# query time instead of reading a second, uncompressed copy of each one.
+FTS_TABLE = "notes_fts"
+FTS_VIEW = "notes_search"
+notes_fts = table(FTS_TABLE, column("rowid"), column("title"), column("content"))
+
+SNIPPET_OPEN = "<mark>"
+SNIPPET_CLOSE = "</mark>"
+SNIPPET_TOKENS = 12
+
+
+def _note_text(row: str = "") -> str:
+    return f"note_text({row}content, {row}content_blob, {row}content_codec)"
+
+
+# Compared with sqlite_master by init_search_index
+FTS_DDL = (
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, content, content='{FTS_VIEW}', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+)
+FTS_VIEW_DDL = f"CREATE VIEW {FTS_VIEW} AS SELECT id, title, {_note_text()} AS content FROM notes"
+# External-content tables must be handed the old text to drop it
+_INDEX_NEW = f"INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, {_note_text('new.')});"
+_INDEX_OLD = (
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content) "
+    f"VALUES ('delete', old.id, old.title, {_note_text('old.')});"
+)
+FTS_TRIGGERS = {
+    "notes_fts_insert": f"AFTER INSERT ON notes BEGIN {_INDEX_NEW} END",
+    "notes_fts_delete": f"AFTER DELETE ON notes BEGIN {_INDEX_OLD} END",
+    "notes_fts_update": (
+        "AFTER UPDATE OF title, content, content_blob, content_codec ON notes "
+        f"BEGIN {_INDEX_OLD} {_INDEX_NEW} END"
+    ),
+}
+
+# Databases where the FTS5 table was created successfully, keyed by
+# (backend, database) so the sync and aiosqlite engines share the entry
+_enabled_databases: set = set()
+
+
+def _database_key(url) -> tuple:
+    return (url.get_backend_name(), url.database)
+
+
+def init_search_index(engine) -> bool:
+    # Create the index with its view and triggers, and rebuild it when any
+    # of them is missing or of another shape: the older index that kept its
+    # own copy of every body, or triggers dropped by a migration rebuilding
+    # `notes`. Returns False (LIKE fallback) when there is no FTS5 support.
+    if engine.dialect.name != "sqlite":
+        return False
+    expected = {FTS_TABLE: FTS_DDL, FTS_VIEW: FTS_VIEW_DDL}
+    expected.update({name: f"CREATE TRIGGER {name} {body}" for name, body in FTS_TRIGGERS.items()})
+    try:
+        with engine.begin() as conn:
+            current = dict(conn.execute(
+                text("SELECT name, sql FROM sqlite_master WHERE name IN :names")
+                .bindparams(bindparam("names", expanding=True)),
+                {"names": list(expected)}
+            ).all())
+            if current != expected:
+                for name in FTS_TRIGGERS:
+                    conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+                conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+                conn.execute(text(f"DROP VIEW IF EXISTS {FTS_VIEW}"))
+                for sql in expected.values():
+                    conn.execute(text(sql))
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    except OperationalError:
+        return False
+    _enabled_databases.add(_database_key(engine.url))
+    return True
+
+
+def fts_enabled(db: Session) -> bool:
+    return _database_key(db.get_bind().url) in _enabled_databases
+
+
+def reset_index(db: Session) -> None:
+    if not fts_enabled(db):
+        return
+    db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"))
+
+
+def build_match_query(q: str) -> Optional[str]:
+    # Quote every word so user input can never be parsed as FTS5 syntax,
+    # and prefix-match it to stay close to the old substring behaviour.
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def match_subquery(db: Session, q: str):
+    # Subquery of (rowid, rank, snippet) for notes matching `q`, or None
+    # when the LIKE fallback should be used instead.
+    if not fts_enabled(db):
+        return None
+    match = build_match_query(q)
+    if match is None:
+        return None
+    fts = literal_column(FTS_TABLE)
+    return select(
+        notes_fts.c.rowid,
+        func.bm25(fts).label("rank"),
+        func.snippet(fts, -1, SNIPPET_OPEN, SNIPPET_CLOSE, "…", SNIPPET_TOKENS).label("snippet"),
+    ).where(fts.op("MATCH")(match)).subquery()
@@ -0,0 +1,129 @@
+import argparse
+import json
+from typing import Optional
+from sqlalchemy import LargeBinary, cast, func, text, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, load_only
+from models import compression
+from models.note import Notes
+from services.search import FTS_TABLE
+
+# Maintenance for compressed note bodies (see models/compression.py):
+#   python -m services.storage report
+#   python -m services.storage recompress [--batch-size N] [--codec zlib|zstd] [--threshold BYTES]
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _batches(db: Session, batch_size: int, *columns):
+    # Notes in id order, `batch_size` at a time, only the storage columns
+    last_id = 0
+    while True:
+        rows = (
+            db.query(Notes)
+            .options(load_only(Notes.id, *columns))
+            .filter(Notes.id > last_id)
+            .order_by(Notes.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+        db.expunge_all()
+
+
+def compression_report(db: Session, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    # Size of the bodies as text vs. as stored. Plain rows are summed in SQL,
+    # compressed ones are decoded batch by batch, so this is an offline tool.
+    notes, plain_bytes = db.query(
+        func.count(Notes.id),
+        func.coalesce(func.sum(func.length(cast(Notes._content, LargeBinary))), 0)
+    ).filter(Notes.content_codec.is_(None)).one()
+    report = {
+        "notes": notes,
+        "compressed": 0,
+        "codecs": {},
+        "content_bytes": plain_bytes,
+        "stored_bytes": plain_bytes,
+    }
+    for rows in _batches(db, batch_size, Notes._content, Notes.content_blob, Notes.content_codec):
+        for note in rows:
+            if note.content_codec is None:
+                continue
+            report["compressed"] += 1
+            report["codecs"][note.content_codec] = report["codecs"].get(note.content_codec, 0) + 1
+            report["content_bytes"] += len(note.content.encode("utf-8"))
+            report["stored_bytes"] += len(note.content_blob)
+    report["notes"] += report["compressed"]
+    report["ratio"] = round(report["content_bytes"] / report["stored_bytes"], 2) if report["stored_bytes"] else None
+    # Pages on disk: the notes table with its indexes, and the search index
+    report["table_bytes"] = _table_bytes(db, Notes.__tablename__)
+    report["search_index_bytes"] = _table_bytes(db, f"{FTS_TABLE}%")
+    return report
+
+
+def _table_bytes(db: Session, tables: str) -> Optional[int]:
+    # Bytes used by the tables matching the LIKE pattern and their indexes,
+    # None when SQLite was built without the dbstat table
+    try:
+        return db.scalar(text(
+            "SELECT COALESCE(SUM(dbstat.pgsize), 0) FROM dbstat "
+            "JOIN sqlite_master ON sqlite_master.name = dbstat.name "
+            "WHERE sqlite_master.tbl_name LIKE :tables"
+        ), {"tables": tables})
+    except OperationalError:
+        return None
+
+
+def recompress(
+    db: Session,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    codec: Optional[str] = None,
+    threshold: Optional[int] = None
+) -> dict:
+    # Re-encode every body with the current codec and threshold: compresses
+    # old inline rows, inlines small ones, switches codecs. Each batch is its
+    # own transaction so the write lock is released in between.
+    scanned = changed = 0
+    for rows in _batches(db, batch_size, Notes._content, Notes.content_blob, Notes.content_codec):
+        for note in rows:
+            scanned += 1
+            stored = compression.encode(note.content, codec, threshold)
+            if stored == (note._content, note.content_blob, note.content_codec):
+                continue
+            inline, blob, marker = stored
+            # A storage change is not an edit: updated_at is left as it was
+            db.execute(
+                update(Notes)
+                .where(Notes.id == note.id)
+                .values(_content=inline, content_blob=blob, content_codec=marker, updated_at=Notes.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            changed += 1
+        db.commit()
+    return {"scanned": scanned, "changed": changed}
+
+
+def main(argv=None) -> None:
+    from database import SessionLocal
+    from models import user  # noqa: F401  Notes.owner
+
+    parser = argparse.ArgumentParser(prog="python -m services.storage", description="Note body compression")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("report", help="Print the compression ratio of the stored bodies")
+    run = commands.add_parser("recompress", help="Re-encode the stored bodies in batches")
+    run.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    run.add_argument("--codec", choices=compression.CODECS)
+    run.add_argument("--threshold", type=int, help="Minimum body size in bytes to compress")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        if args.command == "recompress":
+            print(json.dumps(recompress(db, args.batch_size, args.codec, args.threshold)))
+        print(json.dumps(compression_report(db)))
+
+
+if __name__ == "__main__":
+    main()
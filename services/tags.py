@@ -0,0 +1,37 @@
+from typing import Iterable, List
+from sqlalchemy import delete, insert as core_insert
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from models.tag import Tag
+from models.note_tags import note_tags
+
+# Tag resolution in a constant number of statements, without committing:
+# everything runs inside the caller's (note's) transaction.
+
+def resolve_tags(db: Session, names: Iterable[str]) -> List[Tag]:
+    # Returns Tag rows for `names` (duplicates dropped, order kept),
+    # creating the missing ones
+    names = list(dict.fromkeys(names))
+    if not names:
+        return []
+
+    found = {tag.name: tag for tag in db.query(Tag).filter(Tag.name.in_(names))}
+    missing = [name for name in names if name not in found]
+    if missing:
+        # ON CONFLICT keeps concurrent creators of the same tag from failing
+        db.execute(
+            insert(Tag).values([{"name": name} for name in missing])
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        found.update({tag.name: tag for tag in db.query(Tag).filter(Tag.name.in_(missing))})
+    return [found[name] for name in names]
+
+
+def set_note_tags(db: Session, note_id: int, tags: List[Tag], replace: bool = True) -> None:
+    # Write the note_tags rows of a note in a single INSERT
+    if replace:
+        db.execute(delete(note_tags).where(note_tags.c.note_id == note_id))
+    if tags:
+        db.execute(core_insert(note_tags).values([
+            {"note_id": note_id, "tag_id": tag.id} for tag in tags
+        ]))
@@ -1,6 +1,15 @@
-import sys, os, pytest_asyncio, uuid, pytest
+import sys, os, pytest_asyncio, uuid, pytest, tempfile
 from httpx import AsyncClient, ASGITransport
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Run against a fresh throwaway database, never the development notas.db
+TEST_DB_PATH = os.path.join(tempfile.gettempdir(), "notes_api_test.db")
+for suffix in ("", "-wal", "-shm"):
+    if os.path.exists(TEST_DB_PATH + suffix):
+        os.remove(TEST_DB_PATH + suffix)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{TEST_DB_PATH}")
+os.environ.setdefault("DB_PROFILE", "test")
+
 from main import app
 from sqlalchemy.orm import Session
 from database import SessionLocal, get_db
@@ -77,16 +86,31 @@ def clean_database():
     db: Session = next(get_db())
     from models.note import Notes, SharedNote
     from models.user import User
+    from models.note_counter import NoteCounter
+    from models.note_tags import note_tags
+    from models.refresh_token import RefreshToken
+    from services.search import reset_index
+    from services import response_cache
 
+    db.query(NoteCounter).delete()
     db.query(SharedNote).delete()
+    db.execute(note_tags.delete())
     db.query(Notes).delete()
+    db.query(RefreshToken).delete()
     db.query(User).delete()
+    reset_index(db)
     db.commit()
+    response_cache.clear()
     yield
+    db.query(NoteCounter).delete()
     db.query(SharedNote).delete()
+    db.execute(note_tags.delete())
     db.query(Notes).delete()
+    db.query(RefreshToken).delete()
     db.query(User).delete()
+    reset_index(db)
     db.commit()
+    response_cache.clear()
 
 @pytest_asyncio.fixture
 def get_user_by_token():
@@ -58,6 +58,58 @@ async def test_create_note_with_missing_fields(async_client, create_temp_note):
     assert response.status_code == 422
 
 
+@pytest.mark.asyncio
+async def test_create_and_patch_note_tags(async_client):
+    first = (await async_client.post("/notes/", json={
+        "title": "Tagged", "content": "c", "tags": ["work", "ideas", "work"]
+    })).json()
+    second = (await async_client.post("/notes/", json={
+        "title": "Tagged too", "content": "c", "tags": ["ideas", "home"]
+    })).json()
+
+    assert [tag["name"] for tag in first["tags"]] == ["work", "ideas"]
+    ideas_ids = {tag["id"] for note in (first, second) for tag in note["tags"] if tag["name"] == "ideas"}
+    assert len(ideas_ids) == 1
+
+    patched = (await async_client.patch(f"/notes/{first['id']}", json={"tags": ["home"]})).json()
+    assert [tag["name"] for tag in patched["tags"]] == ["home"]
+
+@pytest.mark.asyncio
+async def test_titles_unique_per_owner(async_client, create_test_user, get_auth_headers):
+    first = (await async_client.post("/notes/", json={"title": "Unique", "content": "c"})).json()
+    second = (await async_client.post("/notes/", json={"title": "Unique 2", "content": "c"})).json()
+    # The insert itself detects the duplicate: no title lookup before it
+    from sqlalchemy import event
+    from database import async_engine
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = await async_client.post("/notes/", json={"title": "Unique", "content": "again"})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert response.status_code == 409
+    assert [statement for statement in statements if "FROM users" not in statement][0].startswith("INSERT INTO notes")
+    assert (await async_client.get("/notes/mine")).json()["total"] == 2
+
+    # Renames onto a taken title are rejected and leave the note as it was
+    for method in (async_client.patch, async_client.put):
+        response = await method(f"/notes/{second['id']}", json={"title": "Unique", "content": "changed"})
+        assert response.status_code == 409
+    assert (await async_client.get(f"/notes/{second['id']}")).json()["content"] == "c"
+    assert (await async_client.patch(f"/notes/{first['id']}", json={"title": "Unique"})).status_code == 200
+
+    # Another owner may use the same title
+    create_test_user(username="unique_other", password="pass123")
+    headers = await get_auth_headers("unique_other", "pass123")
+    assert (await async_client.post("/notes/", json={"title": "Unique", "content": "c"}, headers=headers)).status_code == 201
+    response = await async_client.post("/notes/batch", headers=headers, json={"operations": [
+        {"op": "create", "note": {"title": "Unique 2", "content": "c"}},
+        {"op": "create", "note": {"title": "Unique", "content": "c"}},
+    ]})
+    assert [r["status"] for r in response.json()["results"]] == [201, 409]
+
 ################################### END CREATE TESTS - POST ###################################
 ################################### GET TESTS - GET ###########################################
 
@@ -99,7 +151,7 @@ async def test_list_notes_paginated_and_ordered(auth_headers):
         base_url="http://test",
         headers = auth_headers
     ) as client:
-        response = await client.get("/notes/?limit=5&offset=0&order_by=title&sort=asc")
+        response = await client.get("/notes/?limit=5&offset=0&order_by=title&order=asc")
         assert response.status_code == 200
 
         data = response.json()
@@ -126,6 +178,9 @@ async def test_invalid_order_by_field(auth_headers):
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test", headers=auth_headers) as client:
         response = await client.get("/notes/?order_by=invalid_field")
         assert response.status_code == 422
+        # sort only takes "relevance"; the direction is order=asc|desc
+        assert (await client.get("/notes/?sort=foo")).status_code == 422
+        assert (await client.get("/notes/?sort=asc")).status_code == 422
 
 @pytest.mark.asyncio
 async def test_search_query_param(auth_headers):
@@ -135,6 +190,272 @@ async def test_search_query_param(auth_headers):
         data = response.json()
         assert all("Temporário" in note["title"] or "Temporário" in note["content"] for note in data["data"])
 
+@pytest.mark.asyncio
+async def test_search_relevance_and_snippet(async_client):
+    await async_client.post("/notes/", json={"title": "Groceries", "content": "buy milk and bread"})
+    await async_client.post("/notes/", json={"title": "Milk recipes", "content": "milk milk pudding with milk"})
+    await async_client.post("/notes/", json={"title": "Unrelated", "content": "nothing to see"})
+
+    response = await async_client.get("/notes/?q=milk&sort=relevance")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert data["data"][0]["title"] == "Milk recipes"
+    assert all("<mark>" in note["snippet"] for note in data["data"])
+    # Listings without q= carry no snippet
+    assert all("snippet" not in note for note in (await async_client.get("/notes/")).json()["data"])
+    assert all("snippet" not in note for note in (await async_client.get("/notes/mine")).json()["data"])
+
+@pytest.mark.asyncio
+async def test_search_like_fallback(async_client, monkeypatch):
+    from services import search
+    monkeypatch.setattr(search, "fts_enabled", lambda db: False)
+    await async_client.post("/notes/", json={"title": "Fallback note", "content": "searchable body"})
+
+    response = await async_client.get("/notes/?q=chable&sort=relevance")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 1
+    assert data["data"][0]["snippet"] is None
+
+@pytest.mark.asyncio
+async def test_list_mine_cursor_pagination(async_client):
+    for i in range(5):
+        await async_client.post("/notes/", json={"title": f"Cursor note {i}", "content": "page me"})
+
+    seen = []
+    response = await async_client.get("/notes/mine?limit=2")
+    assert response.status_code == 200
+    page = response.json()
+    seen += [note["id"] for note in page["data"]]
+    # A note created mid-scroll must not shift the following pages
+    await async_client.post("/notes/", json={"title": "Late note", "content": "page me"})
+    while page["next_cursor"]:
+        response = await async_client.get(f"/notes/mine?limit=2&cursor={page['next_cursor']}")
+        assert response.status_code == 200
+        page = response.json()
+        seen += [note["id"] for note in page["data"]]
+
+    assert len(seen) == 5
+    assert seen == sorted(seen, reverse=True)
+
+@pytest.mark.asyncio
+async def test_list_notes_cursor_by_title(async_client):
+    for title in ["delta", "alpha", "charlie", "bravo"]:
+        await async_client.post("/notes/", json={"title": title, "content": "sorted"})
+
+    first = (await async_client.get("/notes/?limit=3&order_by=title")).json()
+    second = (await async_client.get(f"/notes/?limit=3&order_by=title&cursor={first['next_cursor']}")).json()
+    titles = [note["title"] for note in first["data"] + second["data"]]
+    assert titles == ["alpha", "bravo", "charlie", "delta"]
+    assert second["next_cursor"] is None
+
+@pytest.mark.asyncio
+async def test_content_cursor_stays_small(async_client):
+    # The cursor carries the sort values, never the whole body
+    for i in range(2):
+        await async_client.post("/notes/", json={"title": f"Long {i}", "content": f"{i} " + "x" * 3000})
+    page = (await async_client.get("/notes/?order_by=content&limit=1")).json()
+    assert len(page["next_cursor"]) < 400
+
+@pytest.mark.asyncio
+async def test_content_cursor_over_orm_written_notes(async_client, create_test_user, create_test_note):
+    # Notes(content=...) keeps preview in step too, so the seek has a value
+    owner = create_test_user(username="orm_writer", password="pass123")
+    for body in ["f", "b", "d", "a", "e", "c"]:
+        create_test_note(user_id=owner["id"], title=f"ORM {body}", content=body)
+    bodies, cursor = [], ""
+    while cursor is not None:
+        page = (await async_client.get(f"/notes/?order_by=content&limit=2{cursor}")).json()
+        assert page["total"] == 6
+        bodies += [note["content"] for note in page["data"]]
+        cursor = page["next_cursor"] and f"&cursor={page['next_cursor']}"
+    assert bodies == ["a", "b", "c", "d", "e", "f"]
+
+@pytest.mark.asyncio
+async def test_invalid_cursor(async_client):
+    response = await async_client.get("/notes/mine?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_list_totals_follow_writes(async_client, create_test_user, get_auth_headers):
+    ids = []
+    for i in range(4):
+        response = await async_client.post("/notes/", json={"title": f"Counted {i}", "content": "c"})
+        ids.append(response.json()["id"])
+    # Build the counters row before the writes below so they go through deltas
+    assert (await async_client.get("/notes/mine")).json()["total"] == 4
+
+    await async_client.patch(f"/notes/{ids[0]}/pin")
+    await async_client.patch(f"/notes/{ids[1]}/favorite")
+    await async_client.patch(f"/notes/{ids[2]}", json={"archived": True})
+    await async_client.delete(f"/notes/{ids[3]}")
+
+    assert (await async_client.get("/notes/mine")).json()["total"] == 2
+    assert (await async_client.get("/notes/mine?archived=true")).json()["total"] == 1
+    assert (await async_client.get("/notes/pinned")).json()["total"] == 1
+    assert (await async_client.get("/notes/favorites")).json()["total"] == 1
+
+    recipient = create_test_user(username="counter_recipient", password="pass123")
+    recipient_headers = await get_auth_headers(recipient["username"], recipient["password"])
+    assert (await async_client.get("/notes/shared", headers=recipient_headers)).json()["total"] == 0
+    for _ in range(2):
+        await async_client.post(f"/notes/{ids[0]}/share", json={"recipient_username": recipient["username"]})
+    assert (await async_client.get("/notes/shared", headers=recipient_headers)).json()["total"] == 1
+    await async_client.patch(f"/notes/{ids[0]}", json={"archived": True})
+    assert (await async_client.get("/notes/shared", headers=recipient_headers)).json()["total"] == 0
+
+def test_counters_rebuild_concurrent_with_writes(create_test_user):
+    # Writers skip an owner without a counters row, so the first read must
+    # count and insert in one step or the notes created in between are lost
+    from concurrent.futures import ThreadPoolExecutor
+    from database import SessionLocal
+    from models.note_counter import NoteCounter
+    from schemas.note import CreateNote
+    from services import counters, note_service
+    owner_id = create_test_user(username="counter_race", password="pass123")["id"]
+    with SessionLocal() as db:
+        for i in range(300):
+            db.add(Notes(title=f"Existing {i}", **note_service.content_fields("c"), owner_id=owner_id))
+        db.commit()
+
+    def create(i):
+        with SessionLocal() as db:
+            note_service.create_note(db, CreateNote(title=f"Concurrent {i}", content="c"), owner_id)
+
+    def first_read(i):
+        with SessionLocal() as db:
+            db.query(NoteCounter).filter(NoteCounter.owner_id == owner_id).delete()
+            db.commit()
+            counters.get_counters(db, owner_id)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: create(i) if i % 2 else first_read(i), range(40)))
+
+    with SessionLocal() as db:
+        assert counters.get_counters(db, owner_id).active == 320
+
+@pytest.mark.asyncio
+async def test_list_without_total(async_client):
+    await async_client.post("/notes/", json={"title": "No total", "content": "c"})
+    response = await async_client.get("/notes/?include_total=false")
+    assert response.status_code == 200
+    assert response.json()["total"] is None
+    assert len(response.json()["data"]) == 1
+
+@pytest.mark.asyncio
+async def test_list_sparse_fields(async_client):
+    for i in range(3):
+        await async_client.post("/notes/", json={"title": f"Sparse {i}", "content": "x" * 1000, "tags": ["s"]})
+    response = await async_client.get("/notes/?fields=title,pinned&limit=2")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 3
+    assert [set(note) for note in body["data"]] == [{"id", "title", "pinned"}] * 2
+    # The cursor still works on a projected page
+    rest = (await async_client.get(f"/notes/?fields=title&cursor={body['next_cursor']}")).json()
+    assert [note["title"] for note in rest["data"]] == ["Sparse 2"]
+
+def test_list_schema_documents_sparse_pages():
+    # The OpenAPI schema must allow the sparse shape the list routes return
+    schema = app.openapi()
+    for path in ("/notes/", "/notes/mine", "/notes/pinned", "/notes/favorites", "/notes/shared", "/notes/visible"):
+        page = schema["paths"][path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        pages = {ref["$ref"].rsplit("/", 1)[1] for ref in page["anyOf"]}
+        searchable = path in ("/notes/", "/notes/shared", "/notes/visible")
+        assert pages == {"PaginatedNotes", "SparseNotes"} | ({"SearchResults"} if searchable else set())
+    # Only search results document a snippet
+    assert "snippet" not in schema["components"]["schemas"]["ResponseNote"]["properties"]
+    assert "snippet" in schema["components"]["schemas"]["SearchNote"]["properties"]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/notes/", "/notes/mine", "/notes/pinned", "/notes/favorites"])
+async def test_list_summary_view_skips_content(async_client, path):
+    await async_client.post("/notes/", json={"title": "Summary", "content": "body", "pinned": True, "favorite": True, "tags": ["s"]})
+    statements = await capture_selects(async_client.get(f"{path}?view=summary"))
+    assert not any("notes.content" in statement for statement, _ in statements)
+    note = (await async_client.get(f"{path}?view=summary")).json()["data"][0]
+    assert "content" not in note
+    assert note["title"] == "Summary"
+    assert note["tags"][0]["name"] == "s"
+
+@pytest.mark.asyncio
+async def test_shared_summary_view(async_client, create_test_user, get_auth_headers):
+    note = (await async_client.post("/notes/", json={"title": "Shared summary", "content": "body"})).json()
+    create_test_user(username="summary_recipient", password="pass123")
+    await async_client.post(f"/notes/{note['id']}/share", json={"recipient_username": "summary_recipient", "can_edit": False})
+    headers = await get_auth_headers("summary_recipient", "pass123")
+    response = await async_client.get("/notes/shared?view=summary", headers=headers)
+    assert response.status_code == 200
+    assert "content" not in response.json()["data"][0]
+
+@pytest.mark.asyncio
+async def test_list_preview_view(async_client):
+    body = "word " * 100
+    note = (await async_client.post("/notes/", json={"title": "Long", "content": body})).json()
+    statements = await capture_selects(async_client.get("/notes/mine?view=preview"))
+    assert not any("notes.content AS" in statement for statement, _ in statements)
+    listed = (await async_client.get("/notes/mine?view=preview")).json()["data"][0]
+    assert "content" not in listed
+    assert listed["preview"] == body[:200]
+    assert listed["content_length"] == len(body)
+
+    # The excerpt follows every write of the body
+    await async_client.patch(f"/notes/{note['id']}", json={"content": "short"})
+    await async_client.post("/notes/batch", json={"operations": [
+        {"op": "create", "note": {"title": "Batch long", "content": "b" * 300}}
+    ]})
+    listed = (await async_client.get("/notes/mine?fields=title,preview,content_length")).json()["data"]
+    assert {note["title"]: (note["preview"], note["content_length"]) for note in listed} == {
+        "Long": ("short", 5), "Batch long": ("b" * 200, 300)
+    }
+
+@pytest.mark.asyncio
+async def test_list_invalid_fields(async_client):
+    response = await async_client.get("/notes/mine?fields=title,secret")
+    assert response.status_code == 422
+
+@pytest.mark.parametrize("pragma, expected", [
+    ("journal_mode", "wal"),
+    ("busy_timeout", 5000),
+    ("temp_store", 2),
+])
+def test_sqlite_pragmas_applied(pragma, expected):
+    from sqlalchemy import text
+    from database import engine, SQLITE_PROFILES, DB_PROFILE
+    assert DB_PROFILE == "test"
+    assert pragma in SQLITE_PROFILES[DB_PROFILE]
+    with engine.connect() as conn:
+        assert conn.execute(text(f"PRAGMA {pragma}")).scalar() == expected
+
+@pytest.mark.asyncio
+async def test_multi_tag_filter_modes(async_client):
+    for title, tags in (("T ab", ["a", "b"]), ("T a", ["a"]), ("T bc", ["b", "c"]), ("T none", [])):
+        await async_client.post("/notes/", json={"title": title, "content": "c", "tags": tags})
+
+    async def titles(query):
+        response = (await async_client.get(f"/notes/?{query}&limit=2")).json()
+        data = response["data"]
+        if response["next_cursor"]:
+            data += (await async_client.get(f"/notes/?{query}&limit=2&cursor={response['next_cursor']}")).json()["data"]
+        return response["total"], sorted(note["title"] for note in data)
+
+    assert await titles("tag=a&tag=b") == (1, ["T ab"])
+    assert await titles("tag=a&tag=b&tag_mode=all") == (1, ["T ab"])
+    assert await titles("tag=a&tag=b&tag_mode=any") == (3, ["T a", "T ab", "T bc"])
+    assert await titles("tag=a&tag=c&tag_mode=none") == (1, ["T none"])
+    assert await titles("tag=b&tag=b") == (2, ["T ab", "T bc"])
+    # Unknown tags: nothing has all of them, they exclude nothing
+    assert await titles("tag=a&tag=missing") == (0, [])
+    assert await titles("tag=missing&tag_mode=any") == (0, [])
+    assert await titles("tag=missing&tag_mode=none") == (4, ["T a", "T ab", "T bc", "T none"])
+    assert (await async_client.get("/notes/?tag=a&tag_mode=some")).status_code == 422
+
+    mine = (await async_client.get("/notes/visible?tag=a&tag=b&tag_mode=any")).json()
+    assert mine["total"] == 3
+    facets = (await async_client.get("/notes/tags?tag=a&tag=b")).json()["data"]
+    assert [(tag["name"], tag["count"]) for tag in facets] == [("a", 1), ("b", 1)]
+
 ################################### END GET TESTS - GET ######################################
 ################################### UPDATE TESTS - UPDATE ####################################
 # Test updating an existing note's title, content, and importance
@@ -229,6 +550,70 @@ async def test_delete_invalid_id(auth_headers):
     assert response.status_code == 422
 
 ################################### END DELETE TESTS - DELETE ###############################
+################################### BATCH TESTS #############################################
+@pytest.mark.asyncio
+async def test_batch_operations(async_client, create_test_user, create_test_note):
+    existing = (await async_client.post("/notes/", json={"title": "Batch existing", "content": "c"})).json()
+    to_delete = (await async_client.post("/notes/", json={"title": "Batch delete me", "content": "c"})).json()
+    other_user = create_test_user(username="batch_other", password="pass123")
+    foreign = create_test_note(user_id=other_user["id"])
+    # Counters exist before the batch, so it must keep them in step
+    assert (await async_client.get("/notes/mine")).json()["total"] == 2
+
+    response = await async_client.post("/notes/batch", json={"operations": [
+        {"op": "create", "note": {"title": "Batch new", "content": "body", "tags": ["sync", "bulk"]}},
+        {"op": "create", "note": {"title": "Batch new", "content": "duplicate"}},
+        {"op": "patch", "note_id": existing["id"], "update": {"content": "patched", "pinned": True}},
+        {"op": "favorite", "note_id": existing["id"]},
+        {"op": "unpin", "note_id": existing["id"]},
+        {"op": "delete", "note_id": to_delete["id"]},
+        {"op": "pin", "note_id": to_delete["id"]},
+        {"op": "archive", "note_id": foreign.id},
+        {"op": "pin", "note_id": 999999},
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == [201, 409, 200, 200, 200, 204, 404, 403, 404]
+
+    created = results[0]["note"]
+    assert sorted(tag["name"] for tag in created["tags"]) == ["bulk", "sync"]
+    final = results[4]["note"]
+    assert final["content"] == "patched"
+    assert final["favorite"] is True
+    assert final["pinned"] is False
+
+    assert (await async_client.get(f"/notes/{to_delete['id']}")).status_code == 404
+    mine = (await async_client.get("/notes/mine")).json()
+    assert mine["total"] == 2
+    assert (await async_client.get("/notes/favorites")).json()["total"] == 1
+
+@pytest.mark.asyncio
+async def test_batch_rename_conflicts_fail_per_item(async_client):
+    first = (await async_client.post("/notes/", json={"title": "Rename first", "content": "c"})).json()
+    second = (await async_client.post("/notes/", json={"title": "Rename second", "content": "c"})).json()
+
+    response = await async_client.post("/notes/batch", json={"operations": [
+        {"op": "patch", "note_id": first["id"], "update": {"title": "Rename second", "pinned": True}},
+        {"op": "patch", "note_id": second["id"], "update": {"title": "Rename second", "content": "kept"}},
+        {"op": "create", "note": {"title": "Rename new", "content": "c"}},
+        {"op": "patch", "note_id": second["id"], "update": {"title": "Rename new"}},
+        {"op": "patch", "note_id": first["id"], "update": {"title": "Rename third"}},
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == [409, 200, 201, 409, 200]
+    assert results[0]["detail"] == "Note with this title already exists"
+    assert results[4]["note"]["title"] == "Rename third"
+    # The failed patch changed nothing, not even its flags
+    assert results[4]["note"]["pinned"] is False
+    assert results[1]["note"]["content"] == "kept"
+
+@pytest.mark.asyncio
+async def test_batch_requires_payload(async_client):
+    response = await async_client.post("/notes/batch", json={"operations": [{"op": "patch", "note_id": 1}]})
+    assert response.status_code == 422
+
+################################### END BATCH TESTS #########################################
 ################################### ACCESS TOKEN TESTS  #####################################
 @pytest.mark.asyncio
 async def test_login_success(create_test_user):
@@ -305,6 +690,146 @@ async def test_protected_route_missing_bearer_prefix(get_auth_headers,create_tes
         )
     assert response.status_code == 401
 
+@pytest.mark.asyncio
+async def test_authenticated_user_is_cached(async_client, auth_headers, override_get_db):
+    from sqlalchemy import event
+    from database import async_engine
+    from auth.cache import principal_cache
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    await async_client.get("/notes/mine")
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = await async_client.get("/notes/mine")
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert not [s for s in statements if "FROM users" in s]
+
+    # Deleting the user drops the cached principal
+    db = override_get_db
+    token = auth_headers["Authorization"].split(" ")[1]
+    from auth.deps import decode_subject
+    username = decode_subject(token)
+    assert principal_cache.get(username) is not None
+    db.delete(db.query(User).filter(User.username == username).one())
+    db.commit()
+    assert principal_cache.get(username) is None
+    assert (await async_client.get("/notes/mine")).status_code == 401
+
+@pytest.mark.asyncio
+async def test_login_rejected_when_hashing_saturated(create_test_user, monkeypatch):
+    from auth.hashing import password_hasher
+    from auth.jwt_handler import create_access_token
+    credentials = create_test_user(username="busy_user", password="test123")
+    monkeypatch.setattr(password_hasher, "workers", 0)
+    monkeypatch.setattr(password_hasher, "queue_size", 0)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/token", data={
+            "username": credentials["username"],
+            "password": credentials["password"]
+        })
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+        # Metrics need a signed-in user
+        assert (await client.get("/metrics/password-hashing")).status_code == 401
+        token = create_access_token({"sub": credentials["username"]})
+        metrics = (await client.get(
+            "/metrics/password-hashing", headers={"Authorization": f"Bearer {token}"}
+        )).json()
+        assert metrics["rejected"] >= 1
+        assert metrics["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_hashing_metrics_count_failures():
+    from auth.hashing import PasswordHasher
+    hasher = PasswordHasher("thread", workers=1, queue_size=1)
+    try:
+        assert await hasher.verify("secret", await hasher.hash("secret"))
+        with pytest.raises(ValueError):
+            await hasher._run(int, "not a number")
+        metrics = hasher.metrics()
+        assert (metrics["succeeded"], metrics["failed"], metrics["in_flight"]) == (2, 1, 0)
+    finally:
+        hasher.shutdown()
+
+@pytest.mark.asyncio
+async def test_hashing_pool_shut_down_with_app():
+    from auth.hashing import password_hasher
+    async with app.router.lifespan_context(app):
+        await password_hasher.hash("secret")
+        assert password_hasher._executor is not None
+    assert password_hasher._executor is None
+
+@pytest.mark.asyncio
+async def test_refresh_token_rotation(create_test_user):
+    credentials = create_test_user(username="refresh_user", password="test123")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        login = (await client.post("/token", data={
+            "username": credentials["username"],
+            "password": credentials["password"]
+        })).json()
+        first = login["refresh_token"]
+
+        response = await client.post("/token/refresh", json={"refresh_token": first})
+        assert response.status_code == 200
+        rotated = response.json()
+        assert rotated["refresh_token"] != first
+        headers = {"Authorization": f"Bearer {rotated['access_token']}"}
+        assert (await client.get("/notes/", headers=headers)).status_code == 200
+
+        # Replaying the old token revokes the whole family
+        assert (await client.post("/token/refresh", json={"refresh_token": first})).status_code == 401
+        assert (await client.post("/token/refresh", json={"refresh_token": rotated["refresh_token"]})).status_code == 401
+
+@pytest.mark.asyncio
+async def test_refresh_rotation_purges_old_rows(create_test_user, override_get_db):
+    from datetime import datetime, timedelta, timezone
+    from models.refresh_token import RefreshToken
+    credentials = create_test_user(username="purge_user", password="test123")
+    db = override_get_db
+    now = datetime.now(timezone.utc)
+    db.add_all([
+        RefreshToken(user_id=credentials["id"], token_hash="e" * 64, family_id="old", expires_at=now - timedelta(days=1)),
+        RefreshToken(user_id=credentials["id"], token_hash="r" * 64, family_id="old",
+                     expires_at=now + timedelta(days=1), revoked_at=now - timedelta(days=2)),
+    ])
+    db.commit()
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        token = (await client.post("/token", data={
+            "username": credentials["username"],
+            "password": credentials["password"]
+        })).json()["refresh_token"]
+        for _ in range(3):
+            token = (await client.post("/token/refresh", json={"refresh_token": token})).json()["refresh_token"]
+
+    # Left: the live token and the ones rotated within the reuse window
+    db.expire_all()
+    rows = db.query(RefreshToken).filter(RefreshToken.user_id == credentials["id"]).all()
+    assert len(rows) == 4
+    assert sum(row.revoked_at is None for row in rows) == 1
+    assert not {"e" * 64, "r" * 64} & {row.token_hash for row in rows}
+
+@pytest.mark.asyncio
+async def test_revoked_refresh_token(create_test_user):
+    credentials = create_test_user(username="logout_user", password="test123")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        token = (await client.post("/token", data={
+            "username": credentials["username"],
+            "password": credentials["password"]
+        })).json()["refresh_token"]
+        assert (await client.post("/token/revoke", json={"refresh_token": token})).status_code == 204
+        assert (await client.post("/token/refresh", json={"refresh_token": token})).status_code == 401
+        assert (await client.post("/token/refresh", json={"refresh_token": "unknown"})).status_code == 401
+
 ################################### END ACCESS TOKEN TESTS  #################################
 ################################### REGISTER TESTS ##########################################
 
@@ -388,4 +913,608 @@ async def test_share_note_success(
 
     assert response.status_code == 200
     assert response.json()["message"] == "Note shared successfully"
-################################### END SHARED NOTES TESTS ##################################
\ No newline at end of file
+
+@pytest.mark.asyncio
+async def test_access_levels_on_note_routes(async_client, create_test_user, get_auth_headers):
+    note = (await async_client.post("/notes/", json={"title": "Access", "content": "c"})).json()
+    url = f"/notes/{note['id']}"
+    for username in ("access_reader", "access_editor", "access_stranger"):
+        create_test_user(username=username, password="pass123")
+    await async_client.post(f"{url}/share", json={"recipient_username": "access_reader", "can_edit": False})
+    await async_client.post(f"{url}/share", json={"recipient_username": "access_editor", "can_edit": True})
+    reader, editor, stranger = [await get_auth_headers(name, "pass123") for name in ("access_reader", "access_editor", "access_stranger")]
+
+    assert (await async_client.get(url, headers=reader)).status_code == 200
+    assert (await async_client.get(url, headers=stranger)).status_code == 403
+    for headers, status in ((stranger, 403), (reader, 403), (editor, 200)):
+        assert (await async_client.patch(url, json={"content": "edited"}, headers=headers)).status_code == status
+        assert (await async_client.put(url, json={"content": "edited"}, headers=headers)).status_code == status
+    # Flags, sharing and deleting are the owner's
+    for headers in (reader, editor):
+        assert (await async_client.patch(f"{url}/pin", headers=headers)).status_code == 403
+        assert (await async_client.post(f"{url}/share", json={"recipient_username": "access_stranger", "can_edit": True}, headers=headers)).status_code == 403
+        assert (await async_client.delete(url, headers=headers)).status_code == 403
+    assert (await async_client.get(url)).json()["content"] == "edited"
+    assert (await async_client.delete(url)).status_code == 204
+    assert (await async_client.patch(url, json={"content": "gone"}, headers=editor)).status_code == 404
+
+@pytest.mark.asyncio
+async def test_note_access_resolved_in_one_query(async_client, create_test_user, get_auth_headers):
+    note = (await async_client.post("/notes/", json={"title": "One query", "content": "c", "tags": ["a"]})).json()
+    create_test_user(username="one_query_reader", password="pass123")
+    await async_client.post(f"/notes/{note['id']}/share", json={"recipient_username": "one_query_reader", "can_edit": False})
+    headers = await get_auth_headers("one_query_reader", "pass123")
+    for request_headers in ({}, headers):
+        statements = await capture_selects(async_client.get(f"/notes/{note['id']}", headers=request_headers))
+        # Besides authentication: the note with the caller's share row, then its tags
+        statements = [statement for statement, _ in statements if "FROM users" not in statement]
+        assert len(statements) == 2
+        assert "shared_notes" in statements[0] and "note_tags" in statements[1]
+
+@pytest.mark.asyncio
+async def test_shared_listing_filters_and_visible_listing(async_client, create_test_user, get_auth_headers):
+    create_test_user(username="visible_user", password="pass123")
+    headers = await get_auth_headers("visible_user", "pass123")
+    shared = []
+    for i, (tags, favorite) in enumerate(((["work"], True), (["home"], False), (["work"], False))):
+        note = (await async_client.post("/notes/", json={"title": f"Shared {i}", "content": f"alpha {i}", "tags": tags, "favorite": favorite})).json()
+        await async_client.post(f"/notes/{note['id']}/share", json={"recipient_username": "visible_user", "can_edit": False})
+        shared.append(note)
+    # Sharing again only updates the permission: still listed once
+    await async_client.post(f"/notes/{shared[0]['id']}/share", json={"recipient_username": "visible_user", "can_edit": True})
+    await async_client.patch(f"/notes/{shared[2]['id']}", json={"archived": True})
+    own = (await async_client.post("/notes/", json={"title": "Own", "content": "alpha own", "tags": ["work"]}, headers=headers)).json()
+    await async_client.post("/notes/", json={"title": "Not shared", "content": "alpha hidden", "tags": ["work"]})
+
+    def titles(response):
+        return [note["title"] for note in response.json()["data"]]
+
+    response = await async_client.get("/notes/shared", headers=headers)
+    assert titles(response) == ["Shared 1", "Shared 0"] and response.json()["total"] == 2
+    response = await async_client.get("/notes/shared?tag=work", headers=headers)
+    assert titles(response) == ["Shared 0"] and response.json()["total"] == 1
+    assert titles(await async_client.get("/notes/shared?favorite=false", headers=headers)) == ["Shared 1"]
+    assert titles(await async_client.get("/notes/shared?archived=true", headers=headers)) == ["Shared 2"]
+    response = await async_client.get("/notes/shared?q=alpha", headers=headers)
+    assert titles(response) == ["Shared 1", "Shared 0"] and response.json()["total"] == 2
+
+    response = await async_client.get("/notes/visible", headers=headers)
+    assert titles(response) == ["Own", "Shared 1", "Shared 0"] and response.json()["total"] == 3
+    assert titles(await async_client.get("/notes/visible?tag=work", headers=headers)) == ["Own", "Shared 0"]
+    assert titles(await async_client.get("/notes/visible?q=alpha&favorite=true", headers=headers)) == ["Shared 0"]
+
+    # One ordering across owned and shared notes: cursors walk both
+    page = (await async_client.get("/notes/visible?limit=2", headers=headers)).json()
+    rest = (await async_client.get(f"/notes/visible?limit=2&cursor={page['next_cursor']}", headers=headers)).json()
+    assert [note["id"] for note in page["data"] + rest["data"]] == [own["id"], shared[1]["id"], shared[0]["id"]]
+################################### END SHARED NOTES TESTS ##################################
+################################### CONDITIONAL REQUEST TESTS ###############################
+@pytest.mark.asyncio
+async def test_note_etag_and_not_modified(async_client):
+    note = (await async_client.post("/notes/", json={"title": "Etag", "content": "c", "tags": ["a"]})).json()
+    response = await async_client.get(f"/notes/{note['id']}")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    # Revalidating costs the version lookup alone
+    revalidate = async_client.get(f"/notes/{note['id']}", headers={"If-None-Match": etag})
+    assert len(await capture_selects(revalidate, status=304)) == 1
+    response = await async_client.get(f"/notes/{note['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.content == b""
+    assert response.headers["etag"] == etag
+
+    # A tag-only edit is a new version too
+    await async_client.patch(f"/notes/{note['id']}", json={"tags": ["b"]})
+    response = await async_client.get(f"/notes/{note['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+@pytest.mark.asyncio
+async def test_note_etag_does_not_bypass_access(async_client, create_test_user, get_auth_headers):
+    note = (await async_client.post("/notes/", json={"title": "Private etag", "content": "c"})).json()
+    etag = (await async_client.get(f"/notes/{note['id']}")).headers["etag"]
+    create_test_user(username="etag_stranger", password="pass123")
+    headers = await get_auth_headers("etag_stranger", "pass123")
+    response = await async_client.get(f"/notes/{note['id']}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_note_etag_not_reused_after_delete(async_client):
+    # Deleting the newest note must not hand its id (and ETag) to the next one
+    note = (await async_client.post("/notes/", json={"title": "Deleted etag", "content": "old"})).json()
+    etag = (await async_client.get(f"/notes/{note['id']}")).headers["etag"]
+    await async_client.delete(f"/notes/{note['id']}")
+    new = (await async_client.post("/notes/", json={"title": "Next etag", "content": "new"})).json()
+    assert new["id"] != note["id"]
+    response = await async_client.get(f"/notes/{new['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+@pytest.mark.asyncio
+async def test_list_etag_follows_writes(async_client, create_test_user, get_auth_headers):
+    note = (await async_client.post("/notes/", json={"title": "List etag", "content": "c"})).json()
+    etag = (await async_client.get("/notes/mine")).headers["etag"]
+    revalidate = async_client.get("/notes/mine", headers={"If-None-Match": etag})
+    assert len(await capture_selects(revalidate, status=304)) == 1
+    # Other query parameters are another representation
+    assert (await async_client.get("/notes/mine?limit=5", headers={"If-None-Match": etag})).status_code == 200
+    assert (await async_client.get("/notes/mine?view=summary", headers={"If-None-Match": etag})).status_code == 200
+    # Listings sharing a scope and a query string still differ by path
+    etags = {(await async_client.get(path)).headers["etag"] for path in ("/notes/mine", "/notes/pinned", "/notes/favorites")}
+    assert len(etags) == 3
+    assert (await async_client.get("/notes/pinned", headers={"If-None-Match": etag})).status_code == 200
+
+    # The recipient's /shared listing changes when the owner edits the note
+    create_test_user(username="etag_recipient", password="pass123")
+    await async_client.post(f"/notes/{note['id']}/share", json={"recipient_username": "etag_recipient", "can_edit": False})
+    headers = await get_auth_headers("etag_recipient", "pass123")
+    shared_etag = (await async_client.get("/notes/shared", headers=headers)).headers["etag"]
+    await async_client.patch(f"/notes/{note['id']}/pin")
+    for path, known, extra in (("/notes/mine", etag, {}), ("/notes/shared", shared_etag, headers)):
+        response = await async_client.get(path, headers={**extra, "If-None-Match": known})
+        assert response.status_code == 200
+        assert response.json()["data"][0]["pinned"] is True
+
+################################### RESPONSE CACHE TESTS ####################################
+@pytest.mark.asyncio
+async def test_list_served_from_response_cache(async_client):
+    from services import response_cache
+    await async_client.post("/notes/", json={"title": "Cached", "content": "c", "tags": ["x"]})
+    hits = response_cache.stats()["hits"]
+    first = await async_client.get("/notes/?tag=x")
+    # A hit costs the change sequence lookup only
+    statements = await capture_selects(async_client.get("/notes/?tag=x"))
+    assert len(statements) == 1
+    assert (await async_client.get("/notes/?tag=x")).content == first.content
+    assert (await async_client.get("/notes/pinned")).json()["total"] == 0
+    stats = (await async_client.get("/metrics/response-cache")).json()
+    assert stats["hits"] - hits == 2 and stats["entries"] == 2
+
+    # Writes drop the user's pages once committed
+    await async_client.post("/notes/", json={"title": "Cached 2", "content": "c"})
+    assert response_cache.stats()["entries"] == 0
+    assert (await async_client.get("/notes/?tag=x")).json()["total"] == 1
+    assert (await async_client.get("/notes/mine")).json()["total"] == 2
+
+@pytest.mark.asyncio
+async def test_shared_cache_invalidated_for_recipients(async_client, create_test_user, get_auth_headers):
+    note = (await async_client.post("/notes/", json={"title": "Cached shared", "content": "old"})).json()
+    create_test_user(username="cache_recipient", password="pass123")
+    headers = await get_auth_headers("cache_recipient", "pass123")
+    assert (await async_client.get("/notes/shared", headers=headers)).json()["total"] == 0
+    await async_client.post(f"/notes/{note['id']}/share", json={"recipient_username": "cache_recipient", "can_edit": False})
+    assert (await async_client.get("/notes/shared", headers=headers)).json()["total"] == 1
+    await async_client.patch(f"/notes/{note['id']}", json={"content": "new"})
+    assert (await async_client.get("/notes/shared", headers=headers)).json()["data"][0]["content"] == "new"
+
+@pytest.mark.asyncio
+async def test_tag_facets(async_client):
+    for title, tags, pinned in (("F1", ["work", "ideas"], True), ("F2", ["work"], False), ("F3", ["home", "work"], False)):
+        await async_client.post("/notes/", json={"title": title, "content": f"facet {title}", "tags": tags, "pinned": pinned})
+    await async_client.post("/notes/", json={"title": "F4", "content": "facet", "tags": ["old"], "archived": True})
+
+    def counts(response):
+        assert response.status_code == 200
+        return [(tag["name"], tag["count"]) for tag in response.json()["data"]]
+
+    assert counts(await async_client.get("/notes/tags")) == [("work", 3), ("home", 1), ("ideas", 1)]
+    assert counts(await async_client.get("/notes/tags?pinned=true")) == [("ideas", 1), ("work", 1)]
+    assert counts(await async_client.get("/notes/tags?tag=home")) == [("home", 1), ("work", 1)]
+    assert counts(await async_client.get("/notes/tags?q=F2")) == [("work", 1)]
+    assert counts(await async_client.get("/notes/tags?archived=true")) == [("old", 1)]
+
+    # Served from the response cache until a tag write commits
+    statements = await capture_selects(async_client.get("/notes/tags"))
+    assert len(statements) == 1
+    pinned = (await async_client.get("/notes/pinned")).json()["data"][0]
+    await async_client.patch(f"/notes/{pinned['id']}", json={"tags": ["home"]})
+    assert counts(await async_client.get("/notes/tags")) == [("home", 2), ("work", 2)]
+
+def test_lru_response_cache_byte_budget():
+    from services.response_cache import LRUResponseCache
+    cache = LRUResponseCache(max_bytes=10)
+    cache.set("a", "user:1", b"aaaa")
+    cache.set("b", "user:2", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.set("c", "user:1", b"cccc")
+    # "b" was the least recently used
+    assert cache.get("b") is None
+    cache.invalidate(["user:1"])
+    assert cache.get("a") is None and cache.get("c") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"], stats["invalidations"]) == (0, 0, 1, 2)
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+
+################################### STORAGE TESTS ###########################################
+LOG_BODY = "".join(f"2026-10-18 12:00:{i % 60:02d} INFO worker-{i % 7} processed job {i}\n" for i in range(400))
+
+def stored_body(note_id):
+    from sqlalchemy import text
+    db = next(get_db())
+    return db.execute(text("SELECT content, content_blob, content_codec FROM notes WHERE id = :id"), {"id": note_id}).one()
+
+@pytest.mark.asyncio
+async def test_large_body_stored_compressed(async_client):
+    note = (await async_client.post("/notes/", json={"title": "Log", "content": LOG_BODY})).json()
+    content, blob, codec = stored_body(note["id"])
+    assert (content, codec) == ("", "zlib")
+    assert len(blob) < len(LOG_BODY) / 3
+    assert (await async_client.get(f"/notes/{note['id']}")).json()["content"] == LOG_BODY
+    assert (await async_client.get("/notes/")).json()["data"][0]["content"] == LOG_BODY
+    assert (await async_client.get("/notes/?q=processed")).json()["total"] == 1
+
+    # Shrinking the body brings it back inline
+    await async_client.patch(f"/notes/{note['id']}", json={"content": "short"})
+    assert tuple(stored_body(note["id"])) == ("short", None, None)
+
+@pytest.mark.asyncio
+async def test_search_index_keeps_no_body_copy(async_client):
+    from sqlalchemy import text
+    note = (await async_client.post("/notes/", json={"title": "Log", "content": LOG_BODY + "zebra"})).json()
+    page = (await async_client.get("/notes/?q=zebra")).json()
+    assert page["total"] == 1 and "<mark>zebra</mark>" in page["data"][0]["snippet"]
+    # External content: the index stores no text of its own
+    db = next(get_db())
+    assert db.scalar(text("SELECT count(*) FROM sqlite_master WHERE name = 'notes_fts_content'")) == 0
+
+    # Writes that bypass the ORM are indexed too
+    db.execute(text("UPDATE notes SET title = 'Renamed' WHERE id = :id"), {"id": note["id"]})
+    db.commit()
+    assert (await async_client.get("/notes/?q=renamed")).json()["total"] == 1
+    await async_client.patch(f"/notes/{note['id']}", json={"content": "short"})
+    assert (await async_client.get("/notes/?q=zebra")).json()["total"] == 0
+    await async_client.delete(f"/notes/{note['id']}")
+    assert (await async_client.get("/notes/?q=renamed")).json()["total"] == 0
+
+def test_search_index_replaces_full_copy_index(tmp_path):
+    from sqlalchemy import create_engine, text
+    from database import Base, _configure
+    from services import search
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    _configure(engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO notes (title, content, preview, content_length) VALUES ('Old', 'kept body', 'kept body', 9)"))
+        conn.execute(text("CREATE VIRTUAL TABLE notes_fts USING fts5(title, content)"))
+        conn.execute(text("INSERT INTO notes_fts (rowid, title, content) SELECT id, title, content FROM notes"))
+
+    assert search.init_search_index(engine)
+    with engine.connect() as conn:
+        assert conn.scalar(text("SELECT sql FROM sqlite_master WHERE name = 'notes_fts'")) == search.FTS_DDL
+        assert conn.scalar(text("SELECT rowid FROM notes_fts WHERE notes_fts MATCH 'kept'")) == 1
+    engine.dispose()
+
+def test_compressed_content_decoded_once(monkeypatch):
+    from models import compression
+    calls = []
+    decode = compression.decode
+    monkeypatch.setattr(compression, "decode", lambda *args: calls.append(1) or decode(*args))
+
+    note = Notes(title="Decoded", owner_id=1)
+    note.content = LOG_BODY
+    assert note.content == LOG_BODY and calls == []
+
+    # A new blob (reload, another write) is decoded again, once
+    inline, blob, codec = compression.encode(LOG_BODY + "more")
+    note._content, note.content_blob, note.content_codec = inline, blob, codec
+    assert note.content == LOG_BODY + "more"
+    assert note.content == LOG_BODY + "more"
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_order_by_content_with_compressed_bodies(async_client):
+    # The compressed bodies have an empty inline column; they must still
+    # sort by their text, and cursors must walk them without skipping
+    await async_client.post("/notes/", json={"title": "Inline b", "content": "b short"})
+    await async_client.post("/notes/", json={"title": "Compressed a", "content": "a " + LOG_BODY})
+    await async_client.post("/notes/", json={"title": "Compressed c", "content": "c " + LOG_BODY})
+    await async_client.post("/notes/", json={"title": "Inline d", "content": "d short"})
+    expected = ["Compressed a", "Inline b", "Compressed c", "Inline d"]
+
+    page = (await async_client.get("/notes/?order_by=content&limit=10")).json()
+    assert [note["title"] for note in page["data"]] == expected
+
+    titles, cursor = [], ""
+    while cursor is not None:
+        page = (await async_client.get(f"/notes/?order_by=content&order=desc&limit=1{cursor}")).json()
+        titles += [note["title"] for note in page["data"]]
+        cursor = page["next_cursor"] and f"&cursor={page['next_cursor']}"
+    assert titles == expected[::-1]
+
+@pytest.mark.asyncio
+async def test_recompress_existing_rows(async_client):
+    from sqlalchemy import text
+    from services import storage
+    ids = [(await async_client.post("/notes/", json={"title": f"Old {i}", "content": "small"})).json()["id"] for i in range(3)]
+    db = next(get_db())
+    # Rows written before compression existed: large bodies stored inline
+    db.execute(text("UPDATE notes SET content = :body"), {"body": LOG_BODY})
+    db.commit()
+    assert storage.compression_report(db)["compressed"] == 0
+
+    assert storage.recompress(db, batch_size=2) == {"scanned": 3, "changed": 3}
+    assert all(stored_body(note_id).content_codec == "zlib" for note_id in ids)
+    report = storage.compression_report(db)
+    assert report["compressed"] == 3 and report["codecs"] == {"zlib": 3}
+    assert report["ratio"] > 3
+    assert report["table_bytes"] > 0 and report["search_index_bytes"] > 0
+    assert (await async_client.get(f"/notes/{ids[0]}")).json()["content"] == LOG_BODY
+
+    # Already encoded rows are left alone
+    assert storage.recompress(db)["changed"] == 0
+
+@pytest.mark.parametrize("codec", ["zlib", "zstd"])
+def test_compression_codecs_round_trip(codec):
+    from models import compression
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    inline, blob, marker = compression.encode(LOG_BODY, codec, threshold=0)
+    assert marker == codec and inline == ""
+    assert compression.decode(inline, blob, marker) == LOG_BODY
+    assert compression.encode("tiny", codec) == ("tiny", None, None)
+################################### END STORAGE TESTS #######################################
+################################### EXPORT TESTS ############################################
+@pytest.mark.asyncio
+async def test_export_ndjson(async_client, create_test_user):
+    import json
+    create_test_user(username="export_reader", password="password")
+    first = (await async_client.post("/notes/", json={"title": "One", "content": "Body\nwith lines", "tags": ["work", "ideas"]})).json()
+    await async_client.post("/notes/", json={"title": "Two", "content": "Other", "archived": True})
+    await async_client.post(f"/notes/{first['id']}/share", json={"recipient_username": "export_reader", "can_edit": True})
+
+    response = await async_client.get("/notes/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert 'filename="notes.ndjson"' in response.headers["content-disposition"]
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["title"] for record in records] == ["One", "Two"]
+    assert records[0]["content"] == "Body\nwith lines"
+    assert sorted(records[0]["tags"]) == ["ideas", "work"]
+    assert records[0]["shared_with"] == [{"username": "export_reader", "can_edit": True}]
+    assert records[1]["archived"] is True and records[1]["shared_with"] == []
+
+    active = (await async_client.get("/notes/export?archived=false")).text.splitlines()
+    assert [json.loads(line)["title"] for line in active] == ["One"]
+
+@pytest.mark.asyncio
+async def test_export_csv(async_client):
+    import csv, io
+    await async_client.post("/notes/", json={"title": "Quoted, title", "content": 'Say "hi"\nbye', "tags": ["a", "b"]})
+    response = await async_client.get("/notes/export?format=csv")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 1
+    assert (rows[0]["title"], rows[0]["content"]) == ("Quoted, title", 'Say "hi"\nbye')
+    assert sorted(rows[0]["tags"].split(",")) == ["a", "b"]
+    assert rows[0]["shared_with"] == ""
+
+    assert (await async_client.get("/notes/export?format=xml")).status_code == 422
+
+@pytest.mark.asyncio
+async def test_export_streams_in_batches(async_client, monkeypatch):
+    import json
+    from services import export
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    for i in range(5):
+        await async_client.post("/notes/", json={"title": f"Note {i}", "content": LOG_BODY if i == 3 else "small", "tags": [f"t{i}"]})
+    records = [json.loads(line) for line in (await async_client.get("/notes/export")).text.splitlines()]
+    assert [record["title"] for record in records] == [f"Note {i}" for i in range(5)]
+    assert [record["tags"] for record in records] == [[f"t{i}"] for i in range(5)]
+    # Compressed bodies are exported decoded
+    assert records[3]["content"] == LOG_BODY
+
+@pytest.mark.asyncio
+async def test_export_only_own_notes(async_client, create_test_user, get_auth_headers):
+    create_test_user(username="export_other", password="password")
+    await async_client.post("/notes/", json={"title": "Mine", "content": "x"})
+    other = await get_auth_headers("export_other", "password")
+    assert (await async_client.get("/notes/export", headers=other)).text == ""
+################################### END EXPORT TESTS ########################################
+################################### IMPORT TESTS ############################################
+@pytest.mark.asyncio
+async def test_import_ndjson_reports_bad_lines(async_client):
+    import json
+    await async_client.post("/notes/", json={"title": "Existing", "content": "x"})
+    lines = [
+        json.dumps({"title": "Imported 1", "content": "one", "tags": ["work", "ideas"], "pinned": True}),
+        "",
+        "{not json",
+        json.dumps({"title": "No content"}),
+        json.dumps({"title": "Existing", "content": "dup"}),
+        json.dumps({"title": "Imported 2", "content": LOG_BODY}),
+        json.dumps(["not", "an", "object"]),
+        json.dumps({"title": "Imported 2", "content": "dup in file"}),
+        json.dumps({"title": "forbidden words", "content": "x"}),
+    ]
+    response = await async_client.post("/notes/import?batch_size=2", content="\n".join(lines).encode())
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["imported"], report["failed"]) == (2, 6)
+    assert [error["line"] for error in report["errors"]] == [3, 4, 5, 7, 8, 9]
+    assert "content" in report["errors"][1]["detail"]
+    assert report["errors"][2]["detail"] == "Note with this title already exists"
+
+    notes = {note["title"]: note for note in (await async_client.get("/notes/mine")).json()["data"]}
+    assert sorted(tag["name"] for tag in notes["Imported 1"]["tags"]) == ["ideas", "work"]
+    assert notes["Imported 1"]["pinned"] is True
+    assert notes["Imported 2"]["content"] == LOG_BODY
+    # Counters, search and the list caches see the imported notes
+    assert (await async_client.get("/notes/mine")).json()["total"] == 3
+    assert (await async_client.get("/notes/pinned")).json()["total"] == 1
+    assert (await async_client.get("/notes/?q=processed")).json()["total"] == 1
+
+@pytest.mark.asyncio
+async def test_import_csv(async_client):
+    body = (
+        "title,content,important,pinned,tags\r\n"
+        'First,"multi\nline, ""quoted""",True,,"a, b"\r\n'
+        "Second,plain,,false,\r\n"
+        "Short row\r\n"
+        "Third,x,maybe,,\r\n"
+    )
+    report = (await async_client.post("/notes/import?format=csv", content=body.encode())).json()
+    assert (report["imported"], report["failed"]) == (2, 2)
+    assert [error["line"] for error in report["errors"]] == [5, 6]
+    notes = {note["title"]: note for note in (await async_client.get("/notes/mine")).json()["data"]}
+    assert notes["First"]["content"] == 'multi\nline, "quoted"'
+    assert notes["First"]["important"] is True
+    assert sorted(tag["name"] for tag in notes["First"]["tags"]) == ["a", "b"]
+    assert notes["Second"]["tags"] == []
+
+@pytest.mark.asyncio
+async def test_export_import_round_trip(async_client):
+    ids = [
+        (await async_client.post("/notes/", json={"title": f"Trip {i}", "content": f"body {i}", "tags": ["t"], "favorite": i == 1})).json()["id"]
+        for i in range(3)
+    ]
+    exported = {fmt: (await async_client.get(f"/notes/export?format={fmt}")).content for fmt in ("ndjson", "csv")}
+    for note_id in ids:
+        await async_client.delete(f"/notes/{note_id}")
+
+    report = (await async_client.post("/notes/import", content=exported["ndjson"])).json()
+    assert (report["imported"], report["failed"]) == (3, 0)
+    # The same notes again, as CSV: every record is now a duplicate title
+    report = (await async_client.post("/notes/import?format=csv", content=exported["csv"])).json()
+    assert (report["imported"], report["failed"]) == (0, 3)
+    notes = (await async_client.get("/notes/mine")).json()["data"]
+    assert sorted((note["title"], note["favorite"], [tag["name"] for tag in note["tags"]]) for note in notes) == [
+        ("Trip 0", False, ["t"]), ("Trip 1", True, ["t"]), ("Trip 2", False, ["t"])
+    ]
+@pytest.mark.asyncio
+async def test_import_title_race_in_later_batch(async_client, monkeypatch):
+    import json
+    from database import SessionLocal
+    from schemas.note import CreateNote
+    from services import imports, note_service
+    insert_notes = imports.insert_notes
+    def racing_insert(db, notes, owner_id):
+        # Another request takes "Raced 3" after the second batch checked its titles
+        if any(note.title == "Raced 3" for note in notes) and len(notes) > 1:
+            with SessionLocal() as other:
+                note_service.create_note(other, CreateNote(title="Raced 3", content="first"), owner_id)
+        return insert_notes(db, notes, owner_id)
+    monkeypatch.setattr(imports, "insert_notes", racing_insert)
+
+    lines = [json.dumps({"title": f"Raced {i}", "content": "c"}) for i in range(4)]
+    response = await async_client.post("/notes/import?batch_size=2", content="\n".join(lines).encode())
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["imported"], report["failed"]) == (3, 1)
+    assert report["errors"] == [{"line": 4, "detail": "Note with this title already exists"}]
+    notes = (await async_client.get("/notes/mine?limit=10")).json()
+    assert notes["total"] == 4
+    assert {note["title"]: note["content"] for note in notes["data"]}["Raced 3"] == "first"
+
+################################### END IMPORT TESTS ########################################
+################################### QUERY PLAN TESTS ########################################
+# Every SELECT the per-user and per-note endpoints run must reach its rows
+# through an index: a plain "SCAN <table>" in the plan is a full table scan
+FULL_SCAN = r"\bSCAN (notes|shared_notes|note_tags|tags|note_counters)\b"
+
+async def capture_selects(request, status=200):
+    from sqlalchemy import event
+    from database import async_engine
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = await request
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert response.status_code == status, response.text
+    assert statements
+    return statements
+
+def full_scans(statements):
+    import re
+    from database import engine
+    scans = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            scans += [(row[-1], statement) for row in plan if re.search(FULL_SCAN, row[-1])]
+    return scans
+
+@pytest.fixture
+async def shared_plan_note(async_client, create_test_user, get_auth_headers):
+    for i in range(3):
+        await async_client.post("/notes/", json={"title": f"Plan {i}", "content": "c", "tags": ["plan"]})
+    note = (await async_client.post("/notes/", json={"title": "Plan shared", "content": "c", "tags": ["plan"]})).json()
+    recipient = create_test_user(username="plan_recipient", password="pass123")
+    await async_client.post(f"/notes/{note['id']}/share", json={"recipient_username": "plan_recipient", "can_edit": True})
+    return note, await get_auth_headers("plan_recipient", "pass123")
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/notes/mine", "/notes/mine?archived=true", "/notes/pinned", "/notes/favorites", "/notes/tags", "/notes/tags?favorite=true"])
+async def test_owner_listings_use_indexes(async_client, shared_plan_note, path):
+    assert full_scans(await capture_selects(async_client.get(path))) == []
+
+@pytest.mark.asyncio
+async def test_shared_notes_use_indexes(async_client, shared_plan_note):
+    note, headers = shared_plan_note
+    statements = await capture_selects(async_client.get("/notes/shared", headers=headers))
+    statements += await capture_selects(async_client.get("/notes/shared?tag=plan&favorite=false", headers=headers))
+    statements += await capture_selects(async_client.get("/notes/visible", headers=headers))
+    statements += await capture_selects(async_client.get(f"/notes/{note['id']}", headers=headers))
+    statements += await capture_selects(async_client.put(f"/notes/{note['id']}", json={"content": "edited"}, headers=headers))
+    assert full_scans(statements) == []
+
+# A page costs the same number of statements whatever its size: the tags
+# are loaded for the whole page at once, not lazily per note
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/notes/", "/notes/?q=paged", "/notes/mine", "/notes/pinned", "/notes/favorites", "/notes/visible"])
+async def test_list_query_count_independent_of_page_size(async_client, path):
+    async def page_cost(count):
+        for i in range(count):
+            await async_client.post("/notes/", json={
+                "title": f"Paged {count} {i}", "content": "paged", "pinned": True, "favorite": True, "tags": [f"t{i}", "shared"]
+            })
+        response = async_client.get(f"{path}{'&' if '?' in path else '?'}limit=100")
+        return len(await capture_selects(response))
+
+    # The first read of an owner builds its counters row
+    await page_cost(0)
+    assert await page_cost(2) == await page_cost(20)
+
+@pytest.mark.asyncio
+async def test_shared_list_query_count_independent_of_page_size(async_client, create_test_user, get_auth_headers):
+    create_test_user(username="paged_recipient", password="pass123")
+    headers = await get_auth_headers("paged_recipient", "pass123")
+    async def page_cost(count):
+        for i in range(count):
+            note = (await async_client.post("/notes/", json={"title": f"Shared {count} {i}", "content": "c", "tags": [f"t{i}"]})).json()
+            await async_client.post(f"/notes/{note['id']}/share", json={"recipient_username": "paged_recipient", "can_edit": False})
+        return len(await capture_selects(async_client.get("/notes/shared?limit=100", headers=headers)))
+
+    await page_cost(0)
+    assert await page_cost(2) == await page_cost(20)
+################################### END QUERY PLAN TESTS ####################################
+################################### BENCHMARK TESTS #########################################
+def test_benchmark_dataset_is_deterministic():
+    from benchmarks import seed
+    first = list(seed.generate(notes=50, users=5, tags=10, seed=7))
+    assert first == list(seed.generate(notes=50, users=5, tags=10, seed=7))
+    assert first != list(seed.generate(notes=50, users=5, tags=10, seed=8))
+    assert seed.parse_scale("100k") == 100_000 and seed.parse_scale("250") == 250
+
+@pytest.mark.asyncio
+async def test_benchmark_smoke():
+    from benchmarks import seed, run
+    from services import response_cache
+    db = next(get_db())
+    dataset = seed.seed_dataset(db, notes=120, users=3, tags=10, share_ratio=0.2, seed=7)
+    assert dataset["notes"] == 120 and dataset["shares"] > 0 and len(dataset["user_ids"]) == 3
+    backend = response_cache.backend
+
+    results = await run.run_benchmarks(dataset, requests=3, warmup=1)
+    assert response_cache.backend is backend
+    assert {"http.list_notes", "http.get_note", "http.search", "http.create_note", "http.share_note",
+            "http.export", "service.list_owned_notes"} <= set(results)
+    for name, result in results.items():
+        assert result["requests"] > 0 and result["ops_per_sec"] > 0, name
+        assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"], name
+        assert result["statements_per_request"] > 0, name
+    assert results["http.export"]["notes_per_export"] == db.query(Notes).filter(Notes.owner_id == dataset["user_ids"][0]).count()
+################################### END BENCHMARK TESTS #####################################